@@ -0,0 +1,204 @@
+"""Append-only audit log backed by the `audit_events` table.
+
+Rows are buffered in memory and inserted in batches (on size, on a timer, or
+before any read). Rows older than the retention window are pruned from the
+flusher thread. Reads use keyset pagination over (ts, id), so every page is
+an index range scan no matter how many rows the table holds.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS audit_events (
+      id TEXT PRIMARY KEY,
+      ts TEXT NOT NULL,
+      event_type TEXT NOT NULL,
+      actor TEXT NOT NULL,
+      tenant_id TEXT NOT NULL,
+      status TEXT NOT NULL,
+      metadata_json TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_tenant_ts ON audit_events (tenant_id, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_actor_ts ON audit_events (actor, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_ts_id ON audit_events (ts, id)",
+]
+
+_INSERT = text(
+    "INSERT INTO audit_events (id, ts, event_type, actor, tenant_id, status, metadata_json) "
+    "VALUES (:id, :ts, :event_type, :actor, :tenant_id, :status, :metadata_json)"
+)
+
+
+def audit_cursor(row: dict) -> str:
+    return f"{row.get('ts', '')}|{row.get('id', '')}"
+
+
+def _parse_cursor(cursor):
+    ts, sep, row_id = str(cursor or "").partition("|")
+    if not sep or not ts:
+        return None
+    return ts, row_id
+
+
+class AuditLogStore:
+    def __init__(
+        self,
+        engine,
+        batch_size: int = 50,
+        flush_interval_sec: float = 1.0,
+        retention_days: int = 90,
+        prune_interval_sec: float = 3600.0,
+        logger=None,
+    ):
+        self._engine = engine
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval_sec = max(0.05, float(flush_interval_sec))
+        self.retention_days = max(0, int(retention_days))
+        self.prune_interval_sec = max(1.0, float(prune_interval_sec))
+        self._log = logger
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._last_prune = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self._engine.begin() as con:
+            for ddl in _SCHEMA:
+                con.execute(text(ddl))
+        self._schema_ready = True
+
+    def append(self, row: dict):
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def import_rows(self, rows):
+        """Bulk-load legacy rows (already in the `audit_log()` payload shape)."""
+        items = [r for r in (rows or []) if isinstance(r, dict) and r.get("id") and r.get("ts")]
+        if items:
+            self._insert(items)
+        return len(items)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        try:
+            self._insert(batch)
+        except Exception as e:
+            with self._lock:
+                self._buffer = batch + self._buffer
+            if self._log:
+                self._log("audit_flush_failed", rows=len(batch), error=str(e)[:200])
+            return 0
+        return len(batch)
+
+    def _insert(self, rows):
+        self.ensure_schema()
+        params = [
+            {
+                "id": str(r.get("id")),
+                "ts": str(r.get("ts")),
+                "event_type": str(r.get("event_type") or "event"),
+                "actor": str(r.get("actor") or "unknown"),
+                "tenant_id": str(r.get("tenant_id") or "default"),
+                "status": str(r.get("status") or "ok"),
+                "metadata_json": json.dumps(r.get("metadata") if isinstance(r.get("metadata"), dict) else {}, ensure_ascii=False),
+            }
+            for r in rows
+        ]
+        with self._engine.begin() as con:
+            con.execute(_INSERT, params)
+
+    def prune(self, now: datetime | None = None):
+        if self.retention_days <= 0:
+            return 0
+        self.ensure_schema()
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).isoformat() + "Z"
+        with self._engine.begin() as con:
+            deleted = con.execute(text("DELETE FROM audit_events WHERE ts < :cutoff"), {"cutoff": cutoff}).rowcount
+        self._last_prune = time.monotonic()
+        return int(deleted or 0)
+
+    def query(self, limit: int = 100, before=None, tenant_id=None, actor=None):
+        """Newest-first page of at most `limit` rows strictly older than `before`."""
+        self.flush()
+        self.ensure_schema()
+        where = []
+        params = {"limit": max(1, int(limit))}
+        cursor = _parse_cursor(before)
+        if cursor:
+            where.append("(ts < :before_ts OR (ts = :before_ts AND id < :before_id))")
+            params["before_ts"], params["before_id"] = cursor
+        if tenant_id:
+            where.append("tenant_id = :tenant_id")
+            params["tenant_id"] = str(tenant_id)
+        if actor:
+            where.append("actor = :actor")
+            params["actor"] = str(actor)
+        sql = "SELECT id, ts, event_type, actor, tenant_id, status, metadata_json FROM audit_events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT :limit"
+        with self._engine.begin() as con:
+            rows = con.execute(text(sql), params).fetchall()
+        out = []
+        for row in rows:
+            try:
+                metadata = json.loads(str(row[6] or "{}"))
+            except Exception:
+                metadata = {}
+            out.append({
+                "id": row[0],
+                "ts": row[1],
+                "event_type": row[2],
+                "actor": row[3],
+                "tenant_id": row[4],
+                "status": row[5],
+                "metadata": metadata,
+            })
+        return out
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lumiere-audit-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_sec):
+            self.flush()
+            if time.monotonic() - self._last_prune >= self.prune_interval_sec:
+                try:
+                    self.prune()
+                except Exception as e:
+                    if self._log:
+                        self._log("audit_prune_failed", error=str(e)[:200])
+
+    def close(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,255 @@
+"""Auth sessions keyed by token hash.
+
+Sessions live in `auth_sessions`, one row per login, keyed by the SHA-256 of
+the bearer token so raw tokens are never stored. Lookups go through a short
+in-process TTL cache; `last_seen_at` is kept in memory and written at most
+once per `touch_interval_sec` per session (and on `flush()`). Expired rows are
+removed with an indexed range delete on `expires_at`.
+
+`expires_at` values are UTC ISO-8601 strings, so they compare correctly as
+text. With several worker processes, a revoked token can stay valid in
+another worker for up to `cache_ttl_sec`.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS auth_sessions (
+      token_hash TEXT PRIMARY KEY,
+      username TEXT NOT NULL,
+      username_key TEXT NOT NULL,
+      created_at TEXT NOT NULL,
+      last_seen_at TEXT NOT NULL,
+      expires_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_auth_sessions_expires ON auth_sessions (expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_auth_sessions_username ON auth_sessions (username_key)",
+]
+
+_COLUMNS = "username, created_at, last_seen_at, expires_at"
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(str(token or "").encode("utf-8")).hexdigest()
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class AuthSessionStore:
+    def __init__(
+        self,
+        engine,
+        normalize_key=None,
+        cache_ttl_sec: float = 30.0,
+        touch_interval_sec: float = 60.0,
+        prune_interval_sec: float = 900.0,
+        max_cached: int = 10000,
+    ):
+        self._engine = engine
+        self._normalize = normalize_key or (lambda value: str(value or "").strip().lower())
+        self.cache_ttl_sec = max(0.0, float(cache_ttl_sec))
+        self.touch_interval_sec = max(0.0, float(touch_interval_sec))
+        self.prune_interval_sec = max(1.0, float(prune_interval_sec))
+        self.max_cached = max(1, int(max_cached))
+        self._cache: dict[str, tuple[float, dict | None]] = {}
+        self._pending_seen: dict[str, str] = {}
+        self._written_seen: dict[str, float] = {}
+        self._last_prune = 0.0
+        self._lock = threading.RLock()
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self._engine.begin() as con:
+            for ddl in _SCHEMA:
+                con.execute(text(ddl))
+        self._schema_ready = True
+
+    def _forget(self, digest: str):
+        self._cache.pop(digest, None)
+        self._pending_seen.pop(digest, None)
+        self._written_seen.pop(digest, None)
+
+    def create(self, token: str, username: str, expires_at: str, now: str | None = None):
+        self.ensure_schema()
+        now = now or _utc_now_iso()
+        digest = token_hash(token)
+        row = {"username": username, "created_at": now, "last_seen_at": now, "expires_at": expires_at}
+        with self._engine.begin() as con:
+            con.execute(
+                text(
+                    "INSERT INTO auth_sessions (token_hash, username, username_key, created_at, last_seen_at, expires_at) "
+                    "VALUES (:token_hash, :username, :username_key, :created_at, :last_seen_at, :expires_at)"
+                ),
+                {"token_hash": digest, "username_key": self._normalize(username), **row},
+            )
+        with self._lock:
+            self._cache[digest] = (time.monotonic() + self.cache_ttl_sec, row)
+            self._written_seen[digest] = time.monotonic()
+        return row
+
+    def import_sessions(self, sessions: dict) -> int:
+        """Load a legacy {token: row} mapping; rows for known tokens are kept."""
+        self.ensure_schema()
+        imported = 0
+        with self._engine.begin() as con:
+            for token, row in (sessions or {}).items():
+                if not isinstance(row, dict) or not row.get("username") or not row.get("expires_at"):
+                    continue
+                digest = token_hash(token)
+                if con.execute(text("SELECT 1 FROM auth_sessions WHERE token_hash = :h"), {"h": digest}).fetchone():
+                    continue
+                now = _utc_now_iso()
+                con.execute(
+                    text(
+                        "INSERT INTO auth_sessions (token_hash, username, username_key, created_at, last_seen_at, expires_at) "
+                        "VALUES (:token_hash, :username, :username_key, :created_at, :last_seen_at, :expires_at)"
+                    ),
+                    {
+                        "token_hash": digest,
+                        "username": str(row["username"]),
+                        "username_key": self._normalize(row["username"]),
+                        "created_at": str(row.get("created_at") or now),
+                        "last_seen_at": str(row.get("last_seen_at") or now),
+                        "expires_at": str(row["expires_at"]),
+                    },
+                )
+                imported += 1
+        return imported
+
+    def get(self, token: str):
+        """Return the session row for `token` (cached), or None."""
+        digest = token_hash(token)
+        now_mono = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None and cached[0] > now_mono:
+                return cached[1]
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            found = con.execute(
+                text(f"SELECT {_COLUMNS} FROM auth_sessions WHERE token_hash = :h"),
+                {"h": digest},
+            ).fetchone()
+        row = None
+        if found:
+            row = {"username": found[0], "created_at": found[1], "last_seen_at": found[2], "expires_at": found[3]}
+        with self._lock:
+            if row is not None and digest in self._pending_seen:
+                row["last_seen_at"] = self._pending_seen[digest]
+            if len(self._cache) >= self.max_cached:
+                self._cache.clear()
+            self._cache[digest] = (now_mono + self.cache_ttl_sec, row)
+        return row
+
+    def touch(self, token: str, now: str | None = None):
+        """Record activity; the row is rewritten at most once per `touch_interval_sec`."""
+        digest = token_hash(token)
+        now = now or _utc_now_iso()
+        now_mono = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None and cached[1] is not None:
+                cached[1]["last_seen_at"] = now
+            if now_mono - self._written_seen.get(digest, 0.0) < self.touch_interval_sec:
+                self._pending_seen[digest] = now
+                return False
+            self._pending_seen.pop(digest, None)
+            self._written_seen[digest] = now_mono
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            con.execute(
+                text("UPDATE auth_sessions SET last_seen_at = :now WHERE token_hash = :h"),
+                {"now": now, "h": digest},
+            )
+        return True
+
+    def refresh(self, token: str, expires_at: str, now: str | None = None):
+        self.ensure_schema()
+        digest = token_hash(token)
+        now = now or _utc_now_iso()
+        with self._engine.begin() as con:
+            updated = con.execute(
+                text("UPDATE auth_sessions SET expires_at = :expires_at, last_seen_at = :now WHERE token_hash = :h"),
+                {"expires_at": expires_at, "now": now, "h": digest},
+            ).rowcount
+        with self._lock:
+            self._forget(digest)
+            if updated:
+                self._written_seen[digest] = time.monotonic()
+        return bool(updated)
+
+    def revoke(self, token: str) -> bool:
+        self.ensure_schema()
+        digest = token_hash(token)
+        with self._engine.begin() as con:
+            deleted = con.execute(text("DELETE FROM auth_sessions WHERE token_hash = :h"), {"h": digest}).rowcount
+        with self._lock:
+            self._forget(digest)
+        return bool(deleted)
+
+    def usernames(self) -> list[str]:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            return [r[0] for r in con.execute(text("SELECT DISTINCT username_key FROM auth_sessions")).fetchall()]
+
+    def revoke_user(self, username: str) -> int:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            deleted = con.execute(
+                text("DELETE FROM auth_sessions WHERE username_key = :k"),
+                {"k": self._normalize(username)},
+            ).rowcount
+        with self._lock:
+            self._cache.clear()
+        return int(deleted or 0)
+
+    def prune_due(self) -> bool:
+        return time.monotonic() - self._last_prune >= self.prune_interval_sec
+
+    def prune(self, now: str | None = None) -> int:
+        """Delete expired sessions with one range delete on the expiry index."""
+        self.ensure_schema()
+        self._last_prune = time.monotonic()
+        with self._engine.begin() as con:
+            deleted = con.execute(
+                text("DELETE FROM auth_sessions WHERE expires_at <= :now"),
+                {"now": now or _utc_now_iso()},
+            ).rowcount
+        with self._lock:
+            self._written_seen.clear()
+            if deleted:
+                self._cache.clear()
+        return int(deleted or 0)
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending_seen = self._pending_seen, {}
+            now_mono = time.monotonic()
+            for digest in pending:
+                self._written_seen[digest] = now_mono
+        if not pending:
+            return 0
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            con.execute(
+                text("UPDATE auth_sessions SET last_seen_at = :now WHERE token_hash = :h"),
+                [{"now": seen, "h": digest} for digest, seen in pending.items()],
+            )
+        return len(pending)
+
+    def count(self) -> int:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            return int(con.execute(text("SELECT COUNT(*) FROM auth_sessions")).scalar() or 0)
@@ -0,0 +1,233 @@
+"""Normalized chat history storage.
+
+Sessions and their messages live in `chat_sessions` / `chat_messages`, both
+keyed by (requester_key, session_id). Saving one session rewrites only that
+session's rows, and every read is an indexed lookup for a single requester.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+      requester_key TEXT NOT NULL,
+      session_id TEXT NOT NULL,
+      requester TEXT NOT NULL,
+      title TEXT NOT NULL,
+      created_at TEXT NOT NULL,
+      updated_at TEXT NOT NULL,
+      message_count INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (requester_key, session_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_chat_sessions_requester_updated ON chat_sessions (requester_key, updated_at)",
+    """
+    CREATE TABLE IF NOT EXISTS chat_messages (
+      requester_key TEXT NOT NULL,
+      session_id TEXT NOT NULL,
+      seq INTEGER NOT NULL,
+      ts TEXT NOT NULL,
+      label TEXT NOT NULL,
+      content_text TEXT NOT NULL,
+      PRIMARY KEY (requester_key, session_id, seq)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_requester_ts ON chat_messages (requester_key, ts)",
+]
+
+_SESSION_COLUMNS = "session_id, requester, title, created_at, updated_at, message_count"
+
+
+def _session_row(row) -> dict:
+    return {
+        "id": row[0],
+        "requester": row[1],
+        "title": row[2],
+        "created_at": row[3],
+        "updated_at": row[4],
+        "message_count": int(row[5] or 0),
+    }
+
+
+class ChatHistoryStore:
+    def __init__(self, engine, max_sessions_per_requester: int = 1200):
+        self._engine = engine
+        self.max_sessions_per_requester = max(1, int(max_sessions_per_requester))
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self._engine.begin() as con:
+            for ddl in _SCHEMA:
+                con.execute(text(ddl))
+        self._schema_ready = True
+
+    def count_sessions(self) -> int:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            return int(con.execute(text("SELECT COUNT(*) FROM chat_sessions")).scalar() or 0)
+
+    def list_sessions(self, requester_key: str, limit: int = 40) -> list[dict]:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            rows = con.execute(
+                text(
+                    f"SELECT {_SESSION_COLUMNS} FROM chat_sessions WHERE requester_key = :rk "
+                    "ORDER BY updated_at DESC LIMIT :limit"
+                ),
+                {"rk": requester_key, "limit": max(1, int(limit))},
+            ).fetchall()
+        return [_session_row(r) for r in rows]
+
+    def get_session(self, requester_key: str, session_id: str, with_messages: bool = True):
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            row = con.execute(
+                text(f"SELECT {_SESSION_COLUMNS} FROM chat_sessions WHERE requester_key = :rk AND session_id = :sid"),
+                {"rk": requester_key, "sid": str(session_id)},
+            ).fetchone()
+            if not row:
+                return None
+            session = _session_row(row)
+            if with_messages:
+                msgs = con.execute(
+                    text(
+                        "SELECT ts, label, content_text FROM chat_messages "
+                        "WHERE requester_key = :rk AND session_id = :sid ORDER BY seq"
+                    ),
+                    {"rk": requester_key, "sid": str(session_id)},
+                ).fetchall()
+                session["messages"] = [{"ts": m[0], "label": m[1], "content_text": m[2]} for m in msgs]
+        return session
+
+    def recent_messages(self, requester_key: str, session_id: str, limit: int = 8) -> list[dict]:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            rows = con.execute(
+                text(
+                    "SELECT ts, label, content_text FROM chat_messages "
+                    "WHERE requester_key = :rk AND session_id = :sid ORDER BY seq DESC LIMIT :limit"
+                ),
+                {"rk": requester_key, "sid": str(session_id), "limit": max(1, int(limit))},
+            ).fetchall()
+        return [{"ts": r[0], "label": r[1], "content_text": r[2]} for r in reversed(rows)]
+
+    def messages_by_ref(self, requester_key: str, refs) -> dict:
+        """Look up messages by (session_id, seq); returns {(session_id, seq): message}
+        with the session title included, skipping refs that no longer exist."""
+        wanted = {(str(sid), int(seq)) for sid, seq in refs}
+        if not wanted:
+            return {}
+        self.ensure_schema()
+        sids = sorted({sid for sid, _ in wanted})
+        params = {"rk": requester_key, **{f"sid{i}": sid for i, sid in enumerate(sids)}}
+        placeholders = ", ".join(f":sid{i}" for i in range(len(sids)))
+        with self._engine.begin() as con:
+            rows = con.execute(
+                text(
+                    "SELECT m.session_id, m.seq, s.title, m.ts, m.label, m.content_text FROM chat_messages m "
+                    "JOIN chat_sessions s ON s.requester_key = m.requester_key AND s.session_id = m.session_id "
+                    f"WHERE m.requester_key = :rk AND m.session_id IN ({placeholders})"
+                ),
+                params,
+            ).fetchall()
+        return {
+            (r[0], int(r[1])): {"title": r[2], "ts": r[3], "label": r[4], "content_text": r[5]}
+            for r in rows
+            if (r[0], int(r[1])) in wanted
+        }
+
+    def iter_messages(self, requester_key: str):
+        """Yield (session_id, title, message) for every message of one requester."""
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            rows = con.execute(
+                text(
+                    "SELECT m.session_id, s.title, m.ts, m.label, m.content_text FROM chat_messages m "
+                    "JOIN chat_sessions s ON s.requester_key = m.requester_key AND s.session_id = m.session_id "
+                    "WHERE m.requester_key = :rk ORDER BY m.session_id, m.seq"
+                ),
+                {"rk": requester_key},
+            ).fetchall()
+        for r in rows:
+            yield r[0], r[1], {"ts": r[2], "label": r[3], "content_text": r[4]}
+
+    def history_version(self, requester_key: str) -> tuple:
+        """A cheap fingerprint of one requester's stored history. Any save,
+        trim or delete, from any worker, changes it."""
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            row = con.execute(
+                text(
+                    "SELECT COUNT(*), MAX(updated_at), COALESCE(SUM(message_count), 0) "
+                    "FROM chat_sessions WHERE requester_key = :rk"
+                ),
+                {"rk": requester_key},
+            ).fetchone()
+        return (int(row[0] or 0), row[1], int(row[2] or 0))
+
+    def save_session(self, requester_key: str, requester: str, session_id: str, title: str, messages: list[dict], now: str, created_at=None):
+        """Insert or replace one session and its messages in a single transaction.
+        Returns the ids of older sessions deleted by the per-requester cap."""
+        self.ensure_schema()
+        params = {"rk": requester_key, "sid": str(session_id)}
+        with self._engine.begin() as con:
+            updated = con.execute(
+                text(
+                    "UPDATE chat_sessions SET title = :title, updated_at = :now, message_count = :n "
+                    "WHERE requester_key = :rk AND session_id = :sid"
+                ),
+                {**params, "title": title, "now": now, "n": len(messages)},
+            ).rowcount
+            if updated:
+                con.execute(text("DELETE FROM chat_messages WHERE requester_key = :rk AND session_id = :sid"), params)
+            else:
+                con.execute(
+                    text(
+                        "INSERT INTO chat_sessions (requester_key, session_id, requester, title, created_at, updated_at, message_count) "
+                        "VALUES (:rk, :sid, :requester, :title, :created, :now, :n)"
+                    ),
+                    {**params, "requester": requester, "title": title, "created": created_at or now, "now": now, "n": len(messages)},
+                )
+            if messages:
+                con.execute(
+                    text(
+                        "INSERT INTO chat_messages (requester_key, session_id, seq, ts, label, content_text) "
+                        "VALUES (:rk, :sid, :seq, :ts, :label, :content_text)"
+                    ),
+                    [
+                        {**params, "seq": i, "ts": m["ts"], "label": m["label"], "content_text": m["content_text"]}
+                        for i, m in enumerate(messages)
+                    ],
+                )
+            trimmed = [] if updated else self._trim_requester(con, requester_key)
+        return trimmed
+
+    def _trim_requester(self, con, requester_key: str) -> list[str]:
+        total = int(con.execute(
+            text("SELECT COUNT(*) FROM chat_sessions WHERE requester_key = :rk"),
+            {"rk": requester_key},
+        ).scalar() or 0)
+        excess = total - self.max_sessions_per_requester
+        if excess <= 0:
+            return []
+        stale = con.execute(
+            text("SELECT session_id FROM chat_sessions WHERE requester_key = :rk ORDER BY updated_at ASC LIMIT :n"),
+            {"rk": requester_key, "n": excess},
+        ).fetchall()
+        for (sid,) in stale:
+            self._delete(con, requester_key, sid)
+        return [str(sid) for (sid,) in stale]
+
+    @staticmethod
+    def _delete(con, requester_key: str, session_id: str) -> bool:
+        params = {"rk": requester_key, "sid": str(session_id)}
+        con.execute(text("DELETE FROM chat_messages WHERE requester_key = :rk AND session_id = :sid"), params)
+        return bool(con.execute(text("DELETE FROM chat_sessions WHERE requester_key = :rk AND session_id = :sid"), params).rowcount)
+
+    def delete_session(self, requester_key: str, session_id: str) -> bool:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            return self._delete(con, requester_key, session_id)
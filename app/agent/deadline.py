@@ -0,0 +1,46 @@
+"""Request-wide time budgets.
+
+An endpoint creates one `Deadline` and hands it down to every stage it calls
+(web search, page fetches, LLM calls and their fallbacks, Khaya). Each stage
+caps its own timeout with `timeout(cap)` so the whole request finishes within
+the budget, and checks `allows(seconds)` before optional work (extra sources,
+repair passes) so it is skipped rather than started when time is short.
+Stages accept `deadline=None`, which keeps their standalone timeouts.
+"""
+from __future__ import annotations
+
+import time
+
+
+class Deadline:
+    def __init__(self, budget_sec: float, clock=None):
+        self._clock = clock or time.monotonic
+        self.budget_sec = max(0.0, float(budget_sec))
+        self._started = self._clock()
+        self._expires = self._started + self.budget_sec
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires - self._clock())
+
+    def elapsed(self) -> float:
+        return self._clock() - self._started
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def allows(self, seconds: float) -> bool:
+        """True if at least `seconds` are left, i.e. optional work may start."""
+        return self.remaining() >= float(seconds)
+
+    def within(self, seconds: float) -> "Deadline":
+        """A child deadline for one stage: `seconds` or what is left, if less."""
+        return Deadline(min(float(seconds), self.remaining()), clock=self._clock)
+
+    def timeout(self, cap: float | None = None) -> float:
+        """The stage timeout: `cap` or the remaining budget, whichever is smaller."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(float(cap), remaining)
+
+
+def stage_timeout(deadline: Deadline | None, cap: float) -> float:
+    return float(cap) if deadline is None else deadline.timeout(cap)
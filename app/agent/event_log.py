@@ -0,0 +1,164 @@
+"""Append-only segmented NDJSON event log.
+
+The active segment is the configured path (e.g. `global_events.jsonl`); once
+it grows past `max_segment_bytes` it is sealed as `<stem>.<seq>.jsonl` and a
+fresh active file is started. Sealed segments are described in a small
+`<stem>.index.json` sidecar (file, count, byte size, first/last ts) so readers
+can skip whole segments by time and `tail()` only touches the segments it
+needs. Appends are a single buffered line write; reads are lazy generators.
+
+Several worker processes may share one log. Appends, the size check and
+rotation run under a `<stem>.lock` file lock, sealed segment names are
+claimed with O_EXCL so a rotation never overwrites another one, and each
+process writes the index through its own temp file.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+
+from app.agent.file_lock import file_lock
+
+
+class SegmentedEventLog:
+    def __init__(self, path: Path, max_segment_bytes: int = 16 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_segment_bytes = max(1024, int(max_segment_bytes))
+        self.index_path = self.path.with_name(f"{self.path.stem}.index.json")
+        self.lock_path = self.path.with_name(f"{self.path.stem}.lock")
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> list[dict]:
+        if not self.index_path.exists():
+            return []
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except Exception:
+            return []
+        return [s for s in data.get("segments", []) if isinstance(s, dict) and s.get("file")]
+
+    def _save_index(self, segments: list[dict]):
+        tmp = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": 1, "segments": segments}, indent=2), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def segments(self) -> list[dict]:
+        return self._load_index()
+
+    def append(self, event: dict):
+        line = json.dumps(event, ensure_ascii=True) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.lock_path):
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(line)
+                    size = f.tell()
+                if size >= self.max_segment_bytes:
+                    self._rotate()
+
+    def _claim_segment(self, seq: int) -> tuple[int, Path]:
+        # Skip names already on disk, including segments a crash left out of the index.
+        while True:
+            sealed = self.path.with_name(f"{self.path.stem}.{seq:06d}{self.path.suffix}")
+            try:
+                os.close(os.open(sealed, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return seq, sealed
+            except FileExistsError:
+                seq += 1
+
+    def _rotate(self):
+        # Caller holds the file lock; the size is re-read under it.
+        try:
+            if self.path.stat().st_size < self.max_segment_bytes:
+                return
+        except FileNotFoundError:
+            return
+        segments = self._load_index()
+        seq, sealed = self._claim_segment(max([int(s.get("seq", 0)) for s in segments] + [0]) + 1)
+        count, first_ts, last_ts = 0, None, None
+        for event in self._iter_file(self.path):
+            count += 1
+            ts = event.get("ts")
+            first_ts = first_ts or ts
+            last_ts = ts or last_ts
+        os.replace(self.path, sealed)
+        segments.append({
+            "seq": seq,
+            "file": sealed.name,
+            "count": count,
+            "bytes": sealed.stat().st_size,
+            "first_ts": first_ts,
+            "last_ts": last_ts,
+        })
+        self._save_index(segments)
+
+    @staticmethod
+    def _iter_file(path: Path):
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except Exception:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def iter(self, since: str | None = None):
+        """Yield events oldest-first, optionally only those with ts >= `since`."""
+        for seg in self._load_index():
+            if since and seg.get("last_ts") and str(seg["last_ts"]) < since:
+                continue
+            for event in self._iter_file(self.path.with_name(seg["file"])):
+                if since and str(event.get("ts", "")) < since:
+                    continue
+                yield event
+        for event in self._iter_file(self.path):
+            if since and str(event.get("ts", "")) < since:
+                continue
+            yield event
+
+    @staticmethod
+    def _tail_file(path: Path, limit: int, block_size: int = 64 * 1024) -> list[dict]:
+        # Read backwards in blocks until `limit` complete lines are available.
+        try:
+            with path.open("rb") as f:
+                f.seek(0, os.SEEK_END)
+                pos = f.tell()
+                buf = b""
+                while pos > 0 and buf.count(b"\n") <= limit:
+                    step = min(block_size, pos)
+                    pos -= step
+                    f.seek(pos)
+                    buf = f.read(step) + buf
+        except FileNotFoundError:
+            return []
+        lines = buf.splitlines()
+        if pos > 0:
+            lines = lines[1:]  # first line may be partial
+        out = []
+        for raw in lines[-limit:]:
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                out.append(json.loads(raw.decode("utf-8")))
+            except Exception:
+                continue
+        return out[-limit:]
+
+    def tail(self, limit: int) -> list[dict]:
+        """Return the newest `limit` events, oldest-first."""
+        limit = max(1, int(limit))
+        out = self._tail_file(self.path, limit)
+        for seg in reversed(self._load_index()):
+            if len(out) >= limit:
+                break
+            need = limit - len(out)
+            out = self._tail_file(self.path.with_name(seg["file"]), need) + out
+        return out[-limit:]
@@ -0,0 +1,188 @@
+"""Background, batched fact extraction.
+
+`add_interaction` used to run an extraction LLM call inline, after the answer
+was already generated. `FactPipeline` takes that work off the request path:
+`submit` appends the interaction to a per-key buffer and returns at once, and a
+daemon thread hands a key's buffered turns to `extract(key, turns)` as one
+batch once `batch_size` turns are waiting or the oldest has waited
+`linger_sec`. The facts it returns go to `apply(key, turns, facts)`. The queue
+is bounded: when `max_pending` turns are buffered, new turns are dropped and
+counted rather than blocking the caller.
+
+`NormalizedTextIndex` is the dedupe side: a per-actor set of hashes of
+whitespace/case/punctuation-normalized texts, so checking whether a fact is
+already stored does not scan the actor's memory items.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalized_text_hash(text) -> str:
+    norm = _WS_RE.sub(" ", str(text or "")).strip().lower().rstrip(".!?;: ")
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+class NormalizedTextIndex:
+    """Hashes of each actor's stored texts. An actor's entry is rebuilt when
+    its row list is replaced or changes length outside `add`."""
+
+    def __init__(self, text_of=None):
+        self._text_of = text_of or (lambda row: row.get("text", "") if isinstance(row, dict) else row)
+        self._entries: dict[str, tuple[tuple[int, int], set]] = {}
+        self._lock = threading.Lock()
+
+    def _hashes(self, actor_key: str, rows) -> set:
+        signature = (id(rows), len(rows))
+        entry = self._entries.get(actor_key)
+        if entry is None or entry[0] != signature:
+            entry = (signature, {normalized_text_hash(self._text_of(row)) for row in list(rows)})
+            self._entries[actor_key] = entry
+        return entry[1]
+
+    def contains(self, actor_key: str, rows, text) -> bool:
+        with self._lock:
+            return normalized_text_hash(text) in self._hashes(actor_key, rows)
+
+    def add(self, actor_key: str, rows, text):
+        """Record `text` after it was appended to `rows`."""
+        with self._lock:
+            entry = self._entries.get(actor_key)
+            if entry is not None and entry[0] == (id(rows), len(rows) - 1):
+                entry[1].add(normalized_text_hash(text))
+                self._entries[actor_key] = ((id(rows), len(rows)), entry[1])
+
+    def invalidate(self, actor_key: str | None = None):
+        with self._lock:
+            if actor_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(actor_key, None)
+
+
+class FactPipeline:
+    def __init__(self, extract, apply, batch_size: int = 4, linger_sec: float = 3.0, max_pending: int = 500, logger=None):
+        self._extract = extract
+        self._apply = apply
+        self.batch_size = max(1, int(batch_size))
+        self.linger_sec = max(0.0, float(linger_sec))
+        self.max_pending = max(1, int(max_pending))
+        self._log = logger
+        self._buffers: OrderedDict[object, list] = OrderedDict()
+        self._first_seen: dict[object, float] = {}
+        self._pending = 0
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: threading.Thread | None = None
+        self._stats = {"submitted": 0, "dropped": 0, "batches": 0, "facts": 0, "errors": 0}
+
+    def submit(self, key, turn) -> bool:
+        """Queue one interaction for `key`; False if the queue is full."""
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self._stats["dropped"] += 1
+                return False
+            self._buffers.setdefault(key, []).append(turn)
+            self._first_seen.setdefault(key, time.monotonic())
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        self._ensure_worker()
+        return True
+
+    def _take_ready(self, force: bool = False):
+        # Caller holds the lock. Returns (key, turns) or None.
+        now = time.monotonic()
+        for key, turns in self._buffers.items():
+            if force or len(turns) >= self.batch_size or now - self._first_seen[key] >= self.linger_sec:
+                batch = turns[: self.batch_size]
+                rest = turns[self.batch_size:]
+                if rest:
+                    self._buffers[key] = rest
+                    self._first_seen[key] = now
+                else:
+                    del self._buffers[key]
+                    del self._first_seen[key]
+                self._pending -= len(batch)
+                self._busy += 1
+                return key, batch
+        return None
+
+    def _next_wait(self):
+        if not self._first_seen:
+            return None
+        oldest = min(self._first_seen.values())
+        return max(0.01, self.linger_sec - (time.monotonic() - oldest))
+
+    def _process(self, key, turns):
+        try:
+            facts = self._extract(key, turns) or []
+            if facts:
+                self._apply(key, turns, facts)
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["facts"] += len(facts)
+        except Exception as e:
+            with self._cond:
+                self._stats["errors"] += 1
+            if self._log:
+                self._log("fact_pipeline_batch_failed", turns=len(turns), error=str(e)[:200])
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                ready = self._take_ready(force=self._stop)
+                while ready is None:
+                    if self._stop and not self._buffers:
+                        return
+                    self._cond.wait(self._next_wait())
+                    ready = self._take_ready(force=self._stop)
+            self._process(*ready)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="lumiere-fact-pipeline", daemon=True)
+            self._thread.start()
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Process everything queued so far on the calling thread; True if empty."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                ready = self._take_ready(force=True)
+                if ready is None:
+                    while self._busy and (deadline is None or time.monotonic() < deadline):
+                        self._cond.wait(0.05)
+                    return not self._buffers and not self._busy
+            self._process(*ready)
+            if deadline is not None and time.monotonic() >= deadline:
+                with self._cond:
+                    return not self._buffers and not self._busy
+
+    def close(self, timeout: float = 10.0):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self._stats, "pending": self._pending, "keys": len(self._buffers)}
@@ -0,0 +1,32 @@
+"""Cross-process advisory file locks.
+
+Gunicorn runs several workers over the same data files, and a
+`threading.Lock` only orders the threads of one worker. `file_lock(path)`
+holds an exclusive `fcntl.flock` on `path` (created if missing) for the
+duration of the `with` block. The lock belongs to the open file, so two
+holders in one process also exclude each other; it must not be nested on the
+same path. Without fcntl (Windows) it does nothing and only the caller's
+thread lock applies.
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # closing the descriptor releases the lock
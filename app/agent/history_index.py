@@ -0,0 +1,181 @@
+"""Per-actor inverted index over chat history messages.
+
+Each actor's messages are tokenized once, when a session is saved (or lazily
+the first time the actor is searched), into token -> {doc: tf} postings.
+Queries score only the documents that share a token with the query, using
+Okapi BM25, and drop stale postings by their precomputed timestamp instead of
+re-parsing every message on every request.
+
+Other worker processes save sessions too. Callers pass the store's current
+`version` for the actor; an index built at a different version is rebuilt
+from the loader. Saves made in this process move the index to the new
+version only if it was current just before the save.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+from collections import Counter, OrderedDict
+
+
+class _ActorIndex:
+    __slots__ = ("docs", "postings", "session_docs", "total_len", "next_id", "version")
+
+    def __init__(self, version=None):
+        self.docs: dict[int, dict] = {}
+        self.postings: dict[str, dict[int, int]] = {}
+        self.session_docs: dict[str, list[int]] = {}
+        self.total_len = 0
+        self.next_id = 0
+        self.version = version
+
+
+class HistoryIndex:
+    def __init__(self, tokenize, parse_ts, max_actors: int = 500, k1: float = 1.2, b: float = 0.75):
+        self._tokenize = tokenize
+        self._parse_ts = parse_ts
+        self.max_actors = max(1, int(max_actors))
+        self.k1 = float(k1)
+        self.b = float(b)
+        self._actors: OrderedDict[str, _ActorIndex] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _epoch(self, ts):
+        dt = self._parse_ts(ts)
+        if dt is None:
+            return None
+        try:
+            return dt.timestamp()
+        except Exception:
+            return None
+
+    def _actor(self, actor_key: str, loader=None, version=None):
+        idx = self._actors.get(actor_key)
+        if idx is not None and (loader is None or version is None or idx.version == version):
+            self._actors.move_to_end(actor_key)
+            return idx
+        if loader is None:
+            return None
+        idx = _ActorIndex(version)
+        by_session: dict[str, tuple[str, list]] = {}
+        for sid, title, message in loader():
+            by_session.setdefault(str(sid), (str(title or ""), []))[1].append(message)
+        for sid, (title, messages) in by_session.items():
+            self._add_session(idx, sid, title, messages)
+        self._actors[actor_key] = idx
+        while len(self._actors) > self.max_actors:
+            self._actors.popitem(last=False)
+        return idx
+
+    def _add_session(self, idx: _ActorIndex, sid: str, title: str, messages):
+        doc_ids = []
+        for m in messages:
+            content = str(m.get("content_text", ""))
+            tf = Counter(self._tokenize(content + " " + title))
+            if not tf:
+                continue
+            doc_id = idx.next_id
+            idx.next_id += 1
+            length = sum(tf.values())
+            idx.docs[doc_id] = {
+                "session_id": sid,
+                "title": title,
+                "ts": m.get("ts"),
+                "epoch": self._epoch(m.get("ts")),
+                "label": m.get("label", "Lumiere"),
+                "content_text": content[:600],
+                "len": length,
+                "tokens": tuple(tf),
+            }
+            idx.total_len += length
+            for token, count in tf.items():
+                idx.postings.setdefault(token, {})[doc_id] = count
+            doc_ids.append(doc_id)
+        if doc_ids:
+            idx.session_docs[sid] = doc_ids
+
+    @staticmethod
+    def _remove_session(idx: _ActorIndex, sid: str):
+        for doc_id in idx.session_docs.pop(sid, []):
+            doc = idx.docs.pop(doc_id, None)
+            if not doc:
+                continue
+            idx.total_len -= doc["len"]
+            for token in doc["tokens"]:
+                plist = idx.postings.get(token)
+                if plist is None:
+                    continue
+                plist.pop(doc_id, None)
+                if not plist:
+                    del idx.postings[token]
+
+    @staticmethod
+    def _advance(idx: _ActorIndex, versions):
+        # `versions` is the store's (before, after) pair around this process's write.
+        if versions is not None and idx.version == versions[0]:
+            idx.version = versions[1]
+
+    def index_session(self, actor_key: str, session_id: str, title: str, messages, versions=None):
+        """Replace one session's postings. No-op until the actor has been loaded."""
+        with self._lock:
+            idx = self._actors.get(actor_key)
+            if idx is None:
+                return
+            self._remove_session(idx, str(session_id))
+            self._add_session(idx, str(session_id), str(title or ""), messages)
+            self._advance(idx, versions)
+
+    def remove_session(self, actor_key: str, session_id: str, versions=None):
+        with self._lock:
+            idx = self._actors.get(actor_key)
+            if idx is not None:
+                self._remove_session(idx, str(session_id))
+                self._advance(idx, versions)
+
+    def invalidate(self, actor_key: str | None = None):
+        with self._lock:
+            if actor_key is None:
+                self._actors.clear()
+            else:
+                self._actors.pop(actor_key, None)
+
+    def search(self, actor_key: str, query: str, limit: int = 8, min_epoch=None, loader=None, version=None):
+        q_tokens = set(self._tokenize(query))
+        if not q_tokens:
+            return []
+        with self._lock:
+            idx = self._actor(actor_key, loader=loader, version=version)
+            if idx is None or not idx.docs:
+                return []
+            n_docs = len(idx.docs)
+            avg_len = idx.total_len / max(1, n_docs)
+            scores: dict[int, float] = {}
+            for token in q_tokens:
+                plist = idx.postings.get(token)
+                if not plist:
+                    continue
+                idf = math.log(1.0 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_id, tf in plist.items():
+                    doc = idx.docs[doc_id]
+                    if min_epoch is not None and doc["epoch"] is not None and doc["epoch"] < min_epoch:
+                        continue
+                    norm = tf + self.k1 * (1.0 - self.b + self.b * doc["len"] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / norm
+            ranked = heapq.nlargest(
+                max(1, int(limit)),
+                scores.items(),
+                key=lambda kv: (kv[1], str(idx.docs[kv[0]]["ts"] or "")),
+            )
+            hits = []
+            for doc_id, score in ranked:
+                doc = idx.docs[doc_id]
+                hits.append({
+                    "score": round(score, 4),
+                    "session_id": doc["session_id"],
+                    "title": doc["title"],
+                    "ts": doc["ts"],
+                    "label": doc["label"],
+                    "content_text": doc["content_text"],
+                })
+            return hits
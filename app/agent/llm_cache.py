@@ -0,0 +1,256 @@
+"""LLM response cache.
+
+Entries are keyed on (model key, temperature, SHA-256 of the whitespace-
+normalized prompt). The first tier is a size-bounded in-process LRU; an
+optional second tier in a SQLite file (`LUMIERE_LLM_CACHE_DB`) is shared by
+every worker on the host and survives restarts.
+
+Caching is opt-in per call site: only sites with a positive TTL in
+`site_ttls` are cached, so free-form chat never returns a stale answer.
+Answers that `is_failure` rejects are never stored. `call_async` answers
+memory hits inline and runs disk lookups and stores in a worker thread, so a
+busy SQLite file never blocks the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_WS_RE = re.compile(r"\s+")
+
+DEFAULT_SITE_TTLS = {
+    "extract_facts": 24 * 3600.0,
+    "adjudicate": 3600.0,
+    "milestones": 24 * 3600.0,
+    "weekly_report": 6 * 3600.0,
+}
+
+
+def normalize_prompt(prompt) -> str:
+    if not isinstance(prompt, str):
+        prompt = "\n".join(f"{m.get('role', '')}: {m.get('content', '')}" for m in (prompt or []) if isinstance(m, dict))
+    return _WS_RE.sub(" ", prompt).strip()
+
+
+def cache_key(model_key: str, prompt, temperature: float = 0.0) -> str:
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model_key}|{float(temperature or 0.0):.3f}|{digest}"
+
+
+def parse_site_ttls(raw: str) -> dict[str, float]:
+    """Parse `site=seconds,...`; `0` turns a site off."""
+    out = {}
+    for part in str(raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            out[name.strip().lower()] = max(0.0, float(value))
+        except ValueError:
+            continue
+    return out
+
+
+class LLMResponseCache:
+    def __init__(self, max_entries: int = 2000, site_ttls: dict | None = None, disk_path: str | None = None, is_failure=None):
+        self.max_entries = max(1, int(max_entries))
+        self.site_ttls = {**DEFAULT_SITE_TTLS, **(site_ttls or {})}
+        self.disk_path = str(disk_path or "").strip() or None
+        self._is_failure = is_failure or (lambda value: False)
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_local = threading.local()
+        self._disk_ready = False
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "skipped_failures": 0}
+        self._site_stats: dict[str, dict] = {}
+
+    def ttl_for(self, site: str) -> float:
+        return float(self.site_ttls.get(str(site or "").lower(), 0.0) or 0.0)
+
+    def enabled(self, site: str) -> bool:
+        return self.ttl_for(site) > 0
+
+    def _disk(self):
+        if not self.disk_path:
+            return None
+        con = getattr(self._disk_local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.disk_path, timeout=2.0)
+            con.execute("PRAGMA journal_mode=WAL")
+            if not self._disk_ready:
+                con.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+                con.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires ON llm_cache (expires_at)")
+                con.commit()
+                self._disk_ready = True
+            self._disk_local.con = con
+        return con
+
+    def _count(self, site: str, field: str):
+        self._stats[field] += 1
+        row = self._site_stats.setdefault(site, {"hits": 0, "misses": 0})
+        if field in row:
+            row[field] += 1
+
+    def get(self, site: str, key: str):
+        now = time.time()
+        value = self._memory_get(site, key, now)
+        return value if value is not None else self._disk_get(site, key, now)
+
+    def _memory_get(self, site: str, key: str, now: float):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._count(site, "hits")
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                self._memory.pop(key, None)
+        return None
+
+    def _disk_get(self, site: str, key: str, now: float):
+        # Counts the miss when there is no disk tier.
+        value = None
+        try:
+            con = self._disk()
+            if con is not None:
+                row = con.execute("SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+                if row:
+                    value = row[0]
+                    self._remember(key, value, float(row[1]))
+        except sqlite3.Error:
+            value = None
+        with self._lock:
+            if value is None:
+                self._count(site, "misses")
+            else:
+                self._count(site, "hits")
+                self._stats["disk_hits"] += 1
+        return value
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, site: str, key: str, value, ttl: float | None = None) -> bool:
+        accepted = self._accept(site, key, value, ttl)
+        if accepted is None:
+            return False
+        self._disk_put(key, *accepted)
+        return True
+
+    def _accept(self, site: str, key: str, value, ttl: float | None):
+        """Store `value` in memory; (text, expires_at) for the disk tier, or
+        None if it is not cacheable."""
+        ttl = self.ttl_for(site) if ttl is None else float(ttl)
+        text = str(value or "")
+        if ttl <= 0 or not text.strip():
+            return None
+        if self._is_failure(text):
+            with self._lock:
+                self._stats["skipped_failures"] += 1
+            return None
+        expires_at = time.time() + ttl
+        self._remember(key, text, expires_at)
+        with self._lock:
+            self._stats["stores"] += 1
+        return text, expires_at
+
+    def _disk_put(self, key: str, text: str, expires_at: float):
+        try:
+            con = self._disk()
+            if con is not None:
+                con.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, text, expires_at))
+                con.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+                con.commit()
+        except sqlite3.Error:
+            pass
+
+    def call(self, site: str, model_key: str, prompt, temperature: float, compute, ttl: float | None = None):
+        """Return a cached answer for this site, or `compute()` and store it."""
+        if not self.enabled(site) and ttl is None:
+            return compute()
+        key = cache_key(model_key, prompt, temperature)
+        cached = self.get(site, key)
+        if cached is not None:
+            return cached
+        value = compute()
+        self.put(site, key, value, ttl=ttl)
+        return value
+
+    async def call_async(self, site: str, model_key: str, prompt, temperature: float, compute, ttl: float | None = None):
+        """Async twin of `call`; `compute` is a zero-argument coroutine function."""
+        if not self.enabled(site) and ttl is None:
+            return await compute()
+        key = cache_key(model_key, prompt, temperature)
+        now = time.time()
+        cached = self._memory_get(site, key, now)
+        if cached is None:
+            cached = await self._off_loop(self._disk_get, site, key, now)
+        if cached is not None:
+            return cached
+        value = await compute()
+        accepted = self._accept(site, key, value, ttl)
+        if accepted is not None:
+            await self._off_loop(self._disk_put, key, *accepted)
+        return value
+
+    async def _off_loop(self, fn, *args):
+        # SQLite waits up to its busy timeout on a locked file; keep that off the loop.
+        if self.disk_path:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        try:
+            con = self._disk()
+            if con is not None:
+                con.execute("DELETE FROM llm_cache")
+                con.commit()
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._memory),
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "disk_tier": bool(self.disk_path),
+                "sites": {
+                    site: {**row, "ttl_sec": self.ttl_for(site)}
+                    for site, row in sorted(self._site_stats.items())
+                },
+            }
+
+
+_SHARED_CACHE = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_response_cache(is_failure=None) -> LLMResponseCache:
+    """Process-wide cache configured from `LUMIERE_LLM_CACHE_*` env vars."""
+    global _SHARED_CACHE
+    with _SHARED_LOCK:
+        if _SHARED_CACHE is None:
+            _SHARED_CACHE = LLMResponseCache(
+                max_entries=max(1, int(os.getenv("LUMIERE_LLM_CACHE_MAX_ENTRIES", "2000"))),
+                site_ttls=parse_site_ttls(os.getenv("LUMIERE_LLM_CACHE_TTLS", "")),
+                disk_path=os.getenv("LUMIERE_LLM_CACHE_DB", ""),
+                is_failure=is_failure,
+            )
+        elif is_failure is not None:
+            _SHARED_CACHE._is_failure = is_failure
+        return _SHARED_CACHE
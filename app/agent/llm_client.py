@@ -0,0 +1,226 @@
+"""Pooled async HTTP client for LLM providers.
+
+Every provider (Groq, Ollama, ...) gets its own keep-alive connection pool.
+The pools live on one dedicated event-loop thread so that request handlers
+running on any loop (Uvicorn workers, TestClient portals) and plain sync
+helpers share the same warm connections. Awaiting a call from another loop
+is cancellable: cancelling the awaiting task cancels the in-flight request.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except Exception:
+    HTTP2_AVAILABLE = False
+
+
+class ProviderHTTPError(Exception):
+    """Non-2xx provider response; mirrors the fields of urllib's HTTPError."""
+
+    def __init__(self, status_code: int, detail: str = "", headers=None):
+        super().__init__(f"HTTP {int(status_code)}")
+        self.code = int(status_code)
+        self.detail = str(detail or "")
+        self.headers = httpx.Headers(headers or {})
+
+
+class ProviderTimeoutError(TimeoutError):
+    pass
+
+
+class ProviderConnectionError(ConnectionError):
+    pass
+
+
+class ProviderPool:
+    def __init__(
+        self,
+        base_urls: dict[str, str],
+        max_connections: int = 6,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        transport=None,
+    ):
+        self._base_urls = dict(base_urls or {})
+        self._limits = httpx.Limits(
+            max_connections=max(1, int(max_connections)),
+            max_keepalive_connections=max(1, int(max_connections)),
+            keepalive_expiry=float(keepalive_expiry),
+        )
+        self.http2 = bool(http2) and HTTP2_AVAILABLE
+        self._transport = transport
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name="lumiere-llm-pool", daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop, self._thread = loop, thread
+            self._clients = {}
+            return loop
+
+    def _on_pool_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def _client(self, provider: str) -> httpx.AsyncClient:
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            kwargs = {
+                "base_url": self._base_urls.get(provider, ""),
+                "limits": self._limits,
+                "http2": self.http2,
+            }
+            if self._transport is not None:
+                kwargs["transport"] = self._transport
+            client = httpx.AsyncClient(**kwargs)
+            self._clients[provider] = client
+        return client
+
+    async def _on_pool(self, coro):
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _request(self, provider, method, path, payload=None, headers=None, timeout=30.0):
+        client = self._client(provider)
+        try:
+            resp = await client.request(method, path, json=payload, headers=headers, timeout=float(timeout))
+        except httpx.TimeoutException as e:
+            raise ProviderTimeoutError(str(e) or "timed out") from e
+        except httpx.TransportError as e:
+            raise ProviderConnectionError(str(e) or e.__class__.__name__) from e
+        if resp.status_code >= 400:
+            raise ProviderHTTPError(resp.status_code, resp.text, resp.headers)
+        if not resp.content.strip():
+            return {}
+        try:
+            return resp.json()
+        except ValueError:
+            return {"raw": resp.text}
+
+    async def post_json(self, provider: str, path: str, payload, headers=None, timeout: float = 30.0):
+        return await self._on_pool(self._request(provider, "POST", path, payload, headers, timeout))
+
+    async def get_json(self, provider: str, path: str, headers=None, timeout: float = 10.0):
+        return await self._on_pool(self._request(provider, "GET", path, None, headers, timeout))
+
+    async def _iter_lines(self, provider, method, path, payload=None, headers=None, timeout=30.0):
+        client = self._client(provider)
+        try:
+            async with client.stream(method, path, json=payload, headers=headers, timeout=float(timeout)) as resp:
+                if resp.status_code >= 400:
+                    body = await resp.aread()
+                    raise ProviderHTTPError(resp.status_code, body.decode("utf-8", "replace"), resp.headers)
+                async for line in resp.aiter_lines():
+                    if line.strip():
+                        yield line
+        except httpx.TimeoutException as e:
+            raise ProviderTimeoutError(str(e) or "timed out") from e
+        except httpx.TransportError as e:
+            raise ProviderConnectionError(str(e) or e.__class__.__name__) from e
+
+    async def stream_lines(self, provider: str, path: str, payload, headers=None, timeout: float = 30.0):
+        """Yield non-empty response lines (SSE / NDJSON) as the provider sends them.
+
+        `timeout` bounds each network read, not the whole stream. Closing the
+        generator early cancels the upstream request.
+        """
+        loop = self._ensure_loop()
+        running = asyncio.get_running_loop()
+        if running is loop:
+            async for line in self._iter_lines(provider, "POST", path, payload, headers, timeout):
+                yield line
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def _put(item):
+            try:
+                running.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # consumer loop already closed
+
+        async def _produce():
+            try:
+                async for line in self._iter_lines(provider, "POST", path, payload, headers, timeout):
+                    _put(line)
+                _put(done)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _put(e)
+
+        future = asyncio.run_coroutine_threadsafe(_produce(), loop)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def run_sync(self, coro, timeout: float | None = None):
+        """Run `coro` on the pool loop from sync code, cancelling it on timeout."""
+        if self._on_pool_thread():
+            coro.close()
+            raise RuntimeError("run_sync() cannot be called from the provider pool thread")
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self, timeout: float = 5.0):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        if loop is None or thread is None or not thread.is_alive():
+            return
+
+        async def _shutdown():
+            clients = list(self._clients.values())
+            self._clients = {}
+            for client in clients:
+                try:
+                    await client.aclose()
+                except Exception:
+                    pass
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout=timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=timeout)
@@ -0,0 +1,112 @@
+"""Cached provider health and installed-model discovery.
+
+Each provider has a probe: a blocking callable that returns the provider's
+installed model names, or raises if the provider is unreachable. A daemon
+thread runs every probe once per `refresh_interval_sec` (or sooner after
+`invalidate()`) and publishes an immutable snapshot. Request-path readers
+(`models`, `reachable`, `snapshot`) only read that snapshot and never wait on
+the network. Before the first probe finishes, a provider reports no models.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class ModelRegistry:
+    def __init__(self, probes: dict, refresh_interval_sec: float = 60.0, ttl_sec: float | None = None, logger=None):
+        self._probes = dict(probes or {})
+        self.refresh_interval_sec = max(1.0, float(refresh_interval_sec))
+        self.ttl_sec = max(self.refresh_interval_sec, float(ttl_sec if ttl_sec is not None else 3 * self.refresh_interval_sec))
+        self._log = logger
+        self._state: dict[str, dict] = {
+            name: {"reachable": None, "models": (), "checked_at": None, "latency_ms": None, "error": None, "_mono": 0.0}
+            for name in self._probes
+        }
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def refresh(self, provider: str | None = None):
+        """Run probes now (blocking) and publish the results."""
+        names = [provider] if provider else list(self._probes)
+        for name in names:
+            probe = self._probes.get(name)
+            if probe is None:
+                continue
+            started = time.monotonic()
+            try:
+                models = tuple(str(m).strip() for m in (probe() or []) if str(m or "").strip())
+                entry = {"reachable": True, "models": models, "error": None}
+            except Exception as e:
+                previous = self._state.get(name, {})
+                # Keep the last known model list; routing re-checks `reachable`.
+                entry = {"reachable": False, "models": previous.get("models", ()), "error": str(e)[:200]}
+                if self._log and previous.get("reachable") is not False:
+                    self._log("model_registry_probe_failed", provider=name, error=entry["error"])
+            entry.update(
+                checked_at=datetime.now(timezone.utc).isoformat(),
+                latency_ms=round((time.monotonic() - started) * 1000.0, 1),
+                _mono=time.monotonic(),
+            )
+            with self._lock:
+                self._state[name] = entry
+
+    def _entry(self, provider: str) -> dict:
+        self._ensure_refresher()
+        entry = self._state.get(provider)
+        if entry is None:
+            return {}
+        if entry["_mono"] and time.monotonic() - entry["_mono"] > self.ttl_sec:
+            self._wake.set()
+        return entry
+
+    def models(self, provider: str) -> list[str]:
+        return list(self._entry(provider).get("models", ()))
+
+    def reachable(self, provider: str):
+        """True/False from the last probe, or None if it has not run yet."""
+        return self._entry(provider).get("reachable")
+
+    def snapshot(self) -> dict:
+        self._ensure_refresher()
+        now = time.monotonic()
+        out = {}
+        for name, entry in self._state.items():
+            out[name] = {k: (list(v) if k == "models" else v) for k, v in entry.items() if not k.startswith("_")}
+            out[name]["stale"] = not entry["_mono"] or now - entry["_mono"] > self.ttl_sec
+        return out
+
+    def invalidate(self):
+        """Ask the background thread to re-probe soon (e.g. after a 404)."""
+        self._ensure_refresher()
+        self._wake.set()
+
+    def _ensure_refresher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lumiere-model-registry", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                if self._log:
+                    self._log("model_registry_refresh_failed", error=str(e)[:200])
+            self._wake.wait(self.refresh_interval_sec)
+            self._wake.clear()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
@@ -0,0 +1,91 @@
+"""Query-aware passage selection for web source text.
+
+A fetched page is split into passages of roughly `target_chars` characters on
+sentence boundaries, each recorded as a (start, end) span of the page text.
+Passages from all sources of one answer are scored against the question with
+Okapi BM25 (IDF over that passage set), and each source keeps its best
+`per_source` passages while the total stays under `total_chars`. Every source
+gets its best passage before any source gets a second one. Ties, including
+pages that share no terms with the question, fall back to document order, so
+such a page contributes its opening text as before.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or that the this to was what when where which who why with you your".split()
+)
+
+
+def passage_tokens(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(str(text or "").lower()) if t not in STOP_WORDS]
+
+
+def split_passages(text: str, target_chars: int = 480) -> list[tuple[int, int]]:
+    """(start, end) spans covering `text`, cut after sentences once a span
+    reaches `target_chars`; a sentence longer than twice that is hard-split."""
+    text = text or ""
+    target = max(40, int(target_chars))
+    spans: list[tuple[int, int]] = []
+    start = 0
+    cuts = [m.end() for m in _SENTENCE_END_RE.finditer(text)] + [len(text)]
+    for cut in cuts:
+        while cut - start > 2 * target:
+            hard = text.rfind(" ", start + target // 2, start + target)
+            hard = hard + 1 if hard > start else start + target
+            spans.append((start, hard))
+            start = hard
+        if cut - start >= target or (cut == len(text) and cut > start):
+            spans.append((start, cut))
+            start = cut
+    return [(s, e) for s, e in spans if text[s:e].strip()]
+
+
+def bm25_scores(query: list[str], docs: list[list[str]], k1: float = 1.2, b: float = 0.75) -> list[float]:
+    if not docs:
+        return []
+    terms = set(query)
+    n_docs = len(docs)
+    avg_len = sum(len(d) for d in docs) / n_docs or 1.0
+    df = Counter(t for d in docs for t in set(d) & terms)
+    scores = []
+    for doc in docs:
+        tf = Counter(t for t in doc if t in terms)
+        score = 0.0
+        for term, freq in tf.items():
+            idf = math.log(1.0 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * freq * (k1 + 1.0) / (freq + k1 * (1.0 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def select_passages(question: str, texts: list[str], per_source: int = 3, total_chars: int = 4800, target_chars: int = 480) -> list[list[dict]]:
+    """For each text, the chosen passages as `{"start", "end", "score"}` in
+    document order."""
+    candidates = []  # (source index, position, start, end)
+    for i, text in enumerate(texts):
+        for pos, (start, end) in enumerate(split_passages(text, target_chars)):
+            candidates.append((i, pos, start, end))
+    scores = bm25_scores(passage_tokens(question), [passage_tokens(texts[i][s:e]) for i, _, s, e in candidates])
+    order = sorted(range(len(candidates)), key=lambda c: (-scores[c], candidates[c][1], candidates[c][0]))
+
+    chosen: list[list[dict]] = [[] for _ in texts]
+    used = 0
+    limit = max(1, int(per_source))
+    for rnd in range(limit):
+        for c in order:
+            i, _, start, end = candidates[c]
+            if len(chosen[i]) != rnd or any(p["start"] == start for p in chosen[i]):
+                continue
+            if used + (end - start) > total_chars:
+                continue
+            chosen[i].append({"start": start, "end": end, "score": round(scores[c], 4)})
+            used += end - start
+    for picks in chosen:
+        picks.sort(key=lambda p: p["start"])
+    return chosen
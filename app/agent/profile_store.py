@@ -0,0 +1,202 @@
+"""Per-(agent, actor) conversation profiles.
+
+Each agent keeps a short raw history and a few extracted facts per actor. They
+live in `agent_profiles`, one row per (specialty, actor_key), so recording an
+interaction rewrites a single row instead of the whole squad document. Rows
+are read lazily into a bounded LRU working set; agent-level fields (accuracy,
+level, learning_score, ...) stay in the squad document.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import text
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS agent_profiles (
+      specialty TEXT NOT NULL,
+      actor_key TEXT NOT NULL,
+      raw_history_json TEXT NOT NULL,
+      facts_json TEXT NOT NULL,
+      updated_at TEXT NOT NULL,
+      PRIMARY KEY (specialty, actor_key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_agent_profiles_actor ON agent_profiles (actor_key)",
+]
+
+
+def _empty_profile() -> dict:
+    return {"raw_history": [], "facts": []}
+
+
+def _decode(raw, default):
+    try:
+        value = json.loads(str(raw or ""))
+    except Exception:
+        return default
+    return value if isinstance(value, list) else default
+
+
+class AgentProfileStore:
+    def __init__(self, engine, max_cached: int = 2000):
+        self._engine = engine
+        self.max_cached = max(1, int(max_cached))
+        self._cache: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._lock = threading.RLock()
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self._engine.begin() as con:
+            for ddl in _SCHEMA:
+                con.execute(text(ddl))
+        self._schema_ready = True
+
+    def _remember(self, key, profile):
+        self._cache[key] = profile
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def get(self, specialty: str, actor_key: str) -> dict:
+        """Return the cached profile dict, loading it (or an empty one) on a miss."""
+        key = (str(specialty), str(actor_key))
+        with self._lock:
+            profile = self._cache.get(key)
+            if profile is not None:
+                self._cache.move_to_end(key)
+                return profile
+            self.ensure_schema()
+            with self._engine.begin() as con:
+                row = con.execute(
+                    text(
+                        "SELECT raw_history_json, facts_json FROM agent_profiles "
+                        "WHERE specialty = :specialty AND actor_key = :actor_key"
+                    ),
+                    {"specialty": key[0], "actor_key": key[1]},
+                ).fetchone()
+            profile = _empty_profile()
+            if row:
+                profile["raw_history"] = _decode(row[0], [])
+                profile["facts"] = _decode(row[1], [])
+            self._remember(key, profile)
+            return profile
+
+    def save(self, specialty: str, actor_key: str, profile: dict | None = None):
+        """Write one profile row. Without `profile` the cached copy is written."""
+        key = (str(specialty), str(actor_key))
+        with self._lock:
+            if profile is None:
+                profile = self._cache.get(key)
+                if profile is None:
+                    return
+            self._remember(key, profile)
+            self._write(key, profile)
+
+    def _write(self, key, profile, con=None, overwrite: bool = True):
+        self.ensure_schema()
+        params = {
+            "specialty": key[0],
+            "actor_key": key[1],
+            "raw_history": json.dumps(list(profile.get("raw_history") or []), ensure_ascii=False),
+            "facts": json.dumps(list(profile.get("facts") or []), ensure_ascii=False),
+            "now": datetime.now().isoformat(),
+        }
+        if con is None:
+            with self._engine.begin() as con:
+                return self._write_row(con, params, overwrite)
+        return self._write_row(con, params, overwrite)
+
+    @staticmethod
+    def _write_row(con, params, overwrite: bool) -> bool:
+        if overwrite:
+            updated = con.execute(
+                text(
+                    "UPDATE agent_profiles SET raw_history_json = :raw_history, facts_json = :facts, updated_at = :now "
+                    "WHERE specialty = :specialty AND actor_key = :actor_key"
+                ),
+                params,
+            ).rowcount
+            if updated:
+                return True
+        else:
+            exists = con.execute(
+                text("SELECT 1 FROM agent_profiles WHERE specialty = :specialty AND actor_key = :actor_key"),
+                params,
+            ).fetchone()
+            if exists:
+                return False
+        con.execute(
+            text(
+                "INSERT INTO agent_profiles (specialty, actor_key, raw_history_json, facts_json, updated_at) "
+                "VALUES (:specialty, :actor_key, :raw_history, :facts, :now)"
+            ),
+            params,
+        )
+        return True
+
+    def import_profiles(self, specialty: str, profiles: dict) -> int:
+        """Seed rows from a legacy `user_profiles` dict; existing rows win."""
+        self.ensure_schema()
+        imported = 0
+        with self._lock, self._engine.begin() as con:
+            for actor_key, profile in (profiles or {}).items():
+                if not isinstance(profile, dict):
+                    continue
+                if self._write((str(specialty), str(actor_key)), profile, con=con, overwrite=False):
+                    imported += 1
+        return imported
+
+    def rename_specialty(self, old: str, new: str) -> int:
+        """Move rows to a renamed agent, keeping the target's rows on conflict."""
+        if old == new:
+            return 0
+        self.ensure_schema()
+        with self._lock, self._engine.begin() as con:
+            rows = con.execute(
+                text("SELECT actor_key, raw_history_json, facts_json FROM agent_profiles WHERE specialty = :old"),
+                {"old": old},
+            ).fetchall()
+            moved = 0
+            for actor_key, raw_history, facts in rows:
+                profile = {"raw_history": _decode(raw_history, []), "facts": _decode(facts, [])}
+                if self._write((new, actor_key), profile, con=con, overwrite=False):
+                    moved += 1
+            con.execute(text("DELETE FROM agent_profiles WHERE specialty = :old"), {"old": old})
+            for key in [k for k in self._cache if k[0] in (old, new)]:
+                self._cache.pop(key, None)
+        return moved
+
+    def clear_actor(self, actor_key: str, history_only: bool = False) -> int:
+        """Empty one actor's history (and facts) across all agents; returns rows that had data."""
+        self.ensure_schema()
+        with self._lock, self._engine.begin() as con:
+            rows = con.execute(
+                text("SELECT specialty, raw_history_json, facts_json FROM agent_profiles WHERE actor_key = :actor_key"),
+                {"actor_key": actor_key},
+            ).fetchall()
+            touched = 0
+            for specialty, raw_history, facts in rows:
+                history = _decode(raw_history, [])
+                fact_list = _decode(facts, [])
+                if history or (not history_only and fact_list):
+                    touched += 1
+                else:
+                    continue
+                profile = {"raw_history": [], "facts": fact_list if history_only else []}
+                self._write((specialty, actor_key), profile, con=con)
+                cached = self._cache.get((specialty, actor_key))
+                if cached is not None:
+                    cached.update(profile)
+        return touched
+
+    def count(self) -> int:
+        self.ensure_schema()
+        with self._engine.begin() as con:
+            return int(con.execute(text("SELECT COUNT(*) FROM agent_profiles")).scalar() or 0)
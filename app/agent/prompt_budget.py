@@ -0,0 +1,110 @@
+"""Token-budgeted prompt assembly.
+
+A prompt is a fixed part (instructions and the user's message, always kept)
+plus context sections, each with a priority. `fit_prompt` spends the model's
+token budget on sections from the highest priority down: a section that fits
+is kept whole, one that does not is trimmed to the remaining budget (from the
+head or the tail, at a line boundary) if at least `min_tokens` would survive,
+and otherwise dropped. Kept sections are emitted in their original order, so
+budgeting never reorders the prompt.
+
+Token counts come from `estimate_tokens`, a local approximation of BPE
+tokenizers: short words are one token, long words one per ~6 characters,
+digit runs one per 3 digits and every other symbol one token. It tends to
+over- rather than under-count English prose, which is the safe direction for
+a budget.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d+|\S")
+
+
+def estimate_tokens(text) -> int:
+    total = 0
+    for piece in _PIECE_RE.findall(str(text or "")):
+        if piece[0].isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece[0].isalpha():
+            total += 1 + (len(piece) - 1) // 6
+        else:
+            total += 1
+    return total
+
+
+@dataclass
+class PromptSection:
+    name: str
+    text: str
+    priority: int = 0
+    min_tokens: int = 32
+    keep: str = "head"  # "tail" keeps the most recent lines, e.g. conversation turns
+
+
+def _trim(text: str, max_tokens: int, keep: str) -> str:
+    lines = text.splitlines()
+    if keep == "tail":
+        lines.reverse()
+    out, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            if not out:
+                # A single oversized line: cut it by characters instead.
+                chars = max(0, int(len(line) * (max_tokens - 1) / max(1, cost)))
+                while chars > 0:
+                    piece = line[-chars:] if keep == "tail" else line[:chars]
+                    if estimate_tokens(piece) <= max_tokens:
+                        break
+                    chars = int(chars * 0.9)
+                line = (line[-chars:] if keep == "tail" else line[:chars]) if chars > 0 else ""
+                if line:
+                    out.append(line)
+            break
+        out.append(line)
+        used += cost
+    if keep == "tail":
+        out.reverse()
+    return "\n".join(out)
+
+
+def fit_prompt(fixed: str, sections: list[PromptSection], budget_tokens: int) -> tuple[dict[str, str], dict]:
+    """Fit `sections` into what `budget_tokens` leaves after `fixed`.
+
+    Returns `(texts, report)`: `texts` maps each section name to the text to
+    use ("" when dropped); `report` has the budget, the estimated prompt size
+    and the names of trimmed and dropped sections.
+    """
+    fixed_tokens = estimate_tokens(fixed)
+    remaining = max(0, int(budget_tokens) - fixed_tokens)
+    texts = {s.name: "" for s in sections}
+    trimmed, dropped = [], []
+    for section in sorted(sections, key=lambda s: -s.priority):
+        text = str(section.text or "").strip("\n")
+        if not text.strip():
+            continue
+        cost = estimate_tokens(text) + 1
+        if cost <= remaining:
+            texts[section.name] = text
+            remaining -= cost
+            continue
+        if remaining >= max(1, section.min_tokens):
+            cut = _trim(text, remaining - 1, section.keep)
+            if cut.strip():
+                texts[section.name] = cut
+                remaining -= estimate_tokens(cut) + 1
+                trimmed.append(section.name)
+                continue
+        dropped.append(section.name)
+    context_tokens = sum(estimate_tokens(t) + 1 for t in texts.values() if t)
+    report = {
+        "budget_tokens": int(budget_tokens),
+        "prompt_tokens": fixed_tokens + context_tokens,
+        "fixed_tokens": fixed_tokens,
+        "context_tokens": context_tokens,
+        "trimmed": trimmed,
+        "dropped": dropped,
+    }
+    return texts, report
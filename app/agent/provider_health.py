@@ -0,0 +1,251 @@
+"""Observed provider latency, circuit breakers and hedging budgets.
+
+`LatencyTracker` keeps a rolling window of successful call durations per model
+key and answers percentile queries. `ProviderHealth` adds a per-key error-rate
+window and `CircuitBreaker`, so a provider that keeps failing (or answered 429
+with Retry-After) is skipped without waiting for a timeout, and derives
+per-key timeouts from observed p99. `HedgeBudget` caps how often a route may
+launch a speculative second request: every request deposits `ratio` tokens (up
+to `burst`) and every hedge spends one, so at most about `ratio` of a route's
+requests send an extra provider call.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200, min_samples: int = 8):
+        self.window = max(1, int(window))
+        self.min_samples = max(1, int(min_samples))
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(max(0.0, float(seconds)))
+
+    def percentile(self, key: str, q: float):
+        """Nearest-rank percentile in seconds, or None below `min_samples`."""
+        with self._lock:
+            samples = sorted(self._samples.get(key) or ())
+        if len(samples) < self.min_samples:
+            return None
+        q = min(1.0, max(0.0, float(q)))
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: {
+                "samples": len(self._samples.get(key) or ()),
+                "p50": self.percentile(key, 0.5),
+                "p90": self.percentile(key, 0.9),
+                "p99": self.percentile(key, 0.99),
+            }
+            for key in keys
+        }
+
+
+class HedgeBudget:
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = max(0.0, float(ratio))
+        self.burst = max(0.0, float(burst))
+        self._tokens = self.burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.ratio <= 0 or self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+def parse_route_ratios(raw: str) -> dict[str, float]:
+    """Parse `route=ratio,...` (e.g. `ask=0.2,debate=0`) into a dict."""
+    out = {}
+    for part in str(raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            out[name.strip().lower()] = max(0.0, float(value))
+        except ValueError:
+            continue
+    return out
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures (or an
+    explicit `trip`), open -> half-open once the cooldown elapses, where a
+    single probe call decides whether to close again or re-open with a longer
+    cooldown."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown_sec: float = 30.0, max_cooldown_sec: float = 600.0, probe_timeout_sec: float = 60.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_sec = max(0.1, float(cooldown_sec))
+        self.max_cooldown_sec = max(self.cooldown_sec, float(max_cooldown_sec))
+        self.probe_timeout_sec = max(1.0, float(probe_timeout_sec))
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probe_started = 0.0
+        self.last_error = None
+
+    def state(self, now: float) -> str:
+        if self.open_until <= 0:
+            return "closed"
+        return "open" if now < self.open_until else "half_open"
+
+    def available(self, now: float) -> bool:
+        state = self.state(now)
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        return now - self.probe_started >= self.probe_timeout_sec
+
+    def acquire(self, now: float) -> bool:
+        if not self.available(now):
+            return False
+        if self.state(now) == "half_open":
+            self.probe_started = now
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probe_started = 0.0
+        self.last_error = None
+
+    def failure(self, now: float, error=None):
+        self.failures += 1
+        self.last_error = error
+        if self.state(now) == "half_open" or self.failures >= self.failure_threshold:
+            self.trip(now)
+
+    def trip(self, now: float, retry_after=None, error=None):
+        if error is not None:
+            self.last_error = error
+        self.trips += 1
+        if retry_after is not None:
+            wait = max(1.0, float(retry_after))
+        else:
+            wait = min(self.max_cooldown_sec, self.cooldown_sec * (2 ** (self.trips - 1)))
+        self.open_until = now + wait
+        self.probe_started = 0.0
+
+
+class ProviderHealth:
+    """Per-model-key latency, error rate and circuit breaker state."""
+
+    def __init__(
+        self,
+        latency: LatencyTracker | None = None,
+        failure_threshold: int = 3,
+        cooldown_sec: float = 30.0,
+        max_cooldown_sec: float = 600.0,
+        error_window: int = 50,
+        timeout_percentile: float = 0.99,
+        timeout_margin: float = 2.0,
+        timeout_floor_sec: float = 8.0,
+        clock=None,
+    ):
+        self.latency = latency or LatencyTracker()
+        self.failure_threshold = failure_threshold
+        self.cooldown_sec = cooldown_sec
+        self.max_cooldown_sec = max_cooldown_sec
+        self.error_window = max(1, int(error_window))
+        self.timeout_percentile = float(timeout_percentile)
+        self.timeout_margin = max(1.0, float(timeout_margin))
+        self.timeout_floor_sec = max(1.0, float(timeout_floor_sec))
+        self._clock = clock or time.monotonic
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._outcomes: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.cooldown_sec, self.max_cooldown_sec)
+        return breaker
+
+    def _outcome(self, key: str, ok: bool):
+        outcomes = self._outcomes.get(key)
+        if outcomes is None:
+            outcomes = self._outcomes[key] = deque(maxlen=self.error_window)
+        outcomes.append(bool(ok))
+
+    def available(self, key: str) -> bool:
+        """Non-claiming check used when choosing fallbacks."""
+        with self._lock:
+            return self._breaker(key).available(self._clock())
+
+    def acquire(self, key: str):
+        """Claim permission for one call; returns (allowed, seconds_until_retry)."""
+        with self._lock:
+            now = self._clock()
+            breaker = self._breaker(key)
+            if breaker.acquire(now):
+                return True, 0
+            return False, max(1, int(round(breaker.open_until - now)))
+
+    def record_success(self, key: str, seconds: float | None = None):
+        if seconds is not None:
+            self.latency.record(key, seconds)
+        with self._lock:
+            self._breaker(key).success()
+            self._outcome(key, True)
+
+    def record_failure(self, key: str, error=None):
+        with self._lock:
+            self._breaker(key).failure(self._clock(), error=error)
+            self._outcome(key, False)
+
+    def trip(self, key: str, retry_after=None, error=None):
+        """Open the breaker now, e.g. on 429/401, for `retry_after` seconds if given."""
+        with self._lock:
+            self._breaker(key).trip(self._clock(), retry_after=retry_after, error=error)
+            self._outcome(key, False)
+
+    def timeout_for(self, key: str, ceiling: float) -> float:
+        """Observed p99 times a safety margin, clamped to [floor, ceiling]."""
+        observed = self.latency.percentile(key, self.timeout_percentile)
+        if observed is None:
+            return float(ceiling)
+        return max(min(self.timeout_floor_sec, float(ceiling)), min(float(ceiling), observed * self.timeout_margin))
+
+    def snapshot(self) -> dict:
+        latency = self.latency.stats()
+        with self._lock:
+            now = self._clock()
+            keys = set(self._breakers) | set(self._outcomes) | set(latency)
+            out = {}
+            for key in sorted(keys):
+                breaker = self._breaker(key)
+                outcomes = self._outcomes.get(key) or ()
+                out[key] = {
+                    "state": breaker.state(now),
+                    "consecutive_failures": breaker.failures,
+                    "retry_in_sec": max(0, int(round(breaker.open_until - now))) if breaker.state(now) == "open" else 0,
+                    "error_rate": round(outcomes.count(False) / len(outcomes), 3) if outcomes else None,
+                    "last_error": breaker.last_error,
+                    "latency": latency.get(key),
+                }
+        return out
@@ -0,0 +1,183 @@
+"""Search backends for live web answers.
+
+A provider turns a query into ranked results, `{"title", "url", "snippet"}`
+dicts. Results may also carry `content`, the document text, in which case
+`gather_live_web_sources` uses it as is instead of fetching the URL.
+
+`LocalCorpusProvider` keeps an ingested document corpus in a SQLite FTS5
+index (Porter-stemmed, BM25-ranked, titles weighted above bodies) and
+returns documents with their content, so live answers over it need no
+network. `FallbackSearchProvider` tries providers in order and returns the
+first non-empty result list. The DuckDuckGo scraper is registered by
+`app.agent.web_content`; `build_search_provider` resolves a spec such as
+`local,duckduckgo` against the registered providers.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_QUERY_STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or should that the this to was what when where which who why will with you your".split()
+)
+
+
+class SearchProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, max_results: int = 5, deadline=None) -> list[dict]:
+        ...
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+
+class FallbackSearchProvider(SearchProvider):
+    def __init__(self, providers: list[SearchProvider]):
+        self.providers = list(providers)
+        self.name = ",".join(p.name for p in self.providers)
+
+    def search(self, query: str, max_results: int = 5, deadline=None) -> list[dict]:
+        for provider in self.providers:
+            if deadline is not None and deadline.expired():
+                break
+            results = provider.search(query, max_results=max_results, deadline=deadline)
+            if results:
+                return results
+        return []
+
+    def stats(self) -> dict:
+        return {"name": self.name, "providers": [p.stats() for p in self.providers]}
+
+
+def fts_match_query(query: str) -> str:
+    """An FTS5 MATCH expression OR-ing the query's content words."""
+    tokens = [t for t in _TOKEN_RE.findall(str(query or "").lower()) if t not in _QUERY_STOP_WORDS]
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(tokens))
+
+
+class LocalCorpusProvider(SearchProvider):
+    name = "local"
+
+    def __init__(self, db_path: str | None = None, loader=None, snippet_tokens: int = 32):
+        self.db_path = str(db_path or "").strip() or ":memory:"
+        self.snippet_tokens = max(8, int(snippet_tokens))
+        self._loader = loader
+        # Set once the loader has finished, so no reader sees a partial corpus.
+        self._loaded = threading.Event()
+        if loader is None:
+            self._loaded.set()
+        self._lock = threading.RLock()
+        self._stats = {"searches": 0, "hits": 0, "empty": 0}
+        self._con = sqlite3.connect(self.db_path, timeout=2.0, check_same_thread=False)
+        try:
+            self._con.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS corpus USING fts5("
+                "title, body, doc_id UNINDEXED, url UNINDEXED, source UNINDEXED, tokenize='porter unicode61')"
+            )
+            self._con.commit()
+            self.available = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: the provider stays empty.
+            self.available = False
+
+    def _ensure_loaded(self):
+        if self._loaded.is_set():
+            return
+        with self._lock:
+            if self._loaded.is_set():
+                return
+            # If the loader raises, the flag stays clear and the next call retries.
+            self._loader(self)
+            self._loaded.set()
+
+    def add_document(self, doc_id: str, title: str, body: str, url: str = "", source: str = "") -> bool:
+        body = str(body or "").strip()
+        if not self.available or not body:
+            return False
+        with self._lock:
+            self._con.execute("DELETE FROM corpus WHERE doc_id = ?", (str(doc_id),))
+            self._con.execute(
+                "INSERT INTO corpus (title, body, doc_id, url, source) VALUES (?, ?, ?, ?, ?)",
+                (str(title or doc_id), body, str(doc_id), str(url or ""), str(source or "")),
+            )
+            self._con.commit()
+        return True
+
+    def remove_document(self, doc_id: str):
+        if not self.available:
+            return
+        with self._lock:
+            self._con.execute("DELETE FROM corpus WHERE doc_id = ?", (str(doc_id),))
+            self._con.commit()
+
+    def ingest_directory(self, directory, source: str = "docs", suffixes=(".md", ".txt")) -> int:
+        """Index every text file under `directory`; the first line is the title."""
+        root = Path(directory)
+        if not root.is_dir():
+            return 0
+        added = 0
+        for path in sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in suffixes):
+            try:
+                text = path.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            title = text.strip().splitlines()[0].lstrip("# ").strip() if text.strip() else path.stem
+            rel = path.relative_to(root).as_posix()
+            added += self.add_document(f"{source}:{rel}", title[:200], text, url=f"local://{source}/{rel}", source=source)
+        return added
+
+    def search(self, query: str, max_results: int = 5, deadline=None) -> list[dict]:
+        match = fts_match_query(query)
+        if not self.available or not match:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            self._stats["searches"] += 1
+            rows = self._con.execute(
+                "SELECT title, url, doc_id, source, body, snippet(corpus, 1, '', '', ' ... ', ?) "
+                "FROM corpus WHERE corpus MATCH ? ORDER BY bm25(corpus, 5.0, 1.0) LIMIT ?",
+                (self.snippet_tokens, match, max(1, int(max_results))),
+            ).fetchall()
+            self._stats["hits" if rows else "empty"] += 1
+        return [
+            {
+                "title": title,
+                "url": url or f"local://{source or 'corpus'}/{doc_id}",
+                "snippet": snippet,
+                "content": body,
+                "provider": self.name,
+            }
+            for title, url, doc_id, source, body, snippet in rows
+        ]
+
+    def count(self) -> int:
+        if not self.available:
+            return 0
+        self._ensure_loaded()
+        with self._lock:
+            return int(self._con.execute("SELECT COUNT(*) FROM corpus").fetchone()[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "available": self.available,
+                "loaded": self._loaded.is_set(),
+                "documents": self.count() if self._loaded.is_set() else None,
+                **self._stats,
+            }
+
+
+def build_search_provider(spec: str, providers: dict[str, SearchProvider]) -> SearchProvider:
+    """`spec` is a comma-separated list of provider names; unknown names are
+    skipped, and an empty result falls back to `duckduckgo`."""
+    chain = [providers[name] for name in (part.strip().lower() for part in str(spec or "").split(",")) if name in providers]
+    if not chain:
+        chain = [providers["duckduckgo"]]
+    return chain[0] if len(chain) == 1 else FallbackSearchProvider(chain)
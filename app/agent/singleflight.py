@@ -0,0 +1,69 @@
+"""Collapse concurrent identical async calls into one.
+
+The first caller for a key (the leader) runs the coroutine; callers that
+arrive while it is in flight await the same result. The shared result lives
+in a `concurrent.futures.Future`, so followers may await it from any event
+loop (request handlers and the provider pool run on different loops). If the
+leader is cancelled, waiting followers retry and one of them becomes the new
+leader. Exceptions are shared like results.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[object, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "collapsed": 0}
+
+    async def do(self, key, fn):
+        """Return `await fn()`, sharing one execution among concurrent callers of `key`."""
+        while True:
+            with self._lock:
+                fut = self._inflight.get(key)
+                leader = fut is None
+                if leader:
+                    fut = concurrent.futures.Future()
+                    self._inflight[key] = fut
+                    self._stats["leaders"] += 1
+                else:
+                    self._stats["collapsed"] += 1
+            if leader:
+                return await self._lead(key, fut, fn)
+            try:
+                return await asyncio.shield(asyncio.wrap_future(fut))
+            except _LeaderCancelled:
+                continue
+
+    async def _lead(self, key, fut, fn):
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._release(key, fut)
+            fut.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            self._release(key, fut)
+            fut.set_exception(e)
+            raise
+        self._release(key, fut)
+        fut.set_result(result)
+        return result
+
+    def _release(self, key, fut):
+        # Unpublish before completing, so a retrying follower never finds a finished future.
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "inflight": len(self._inflight)}
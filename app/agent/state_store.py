@@ -0,0 +1,151 @@
+"""Write-behind store for the `app_state` JSON documents.
+
+`save()` only marks a key dirty and keeps a reference to the live object; a
+background flusher serialises each dirty key at most once per interval, so a
+burst of saves to the same document costs one json.dumps and one UPSERT.
+Keys listed in `sync_keys` (auth state) and `save(..., sync=True)` bypass the
+buffer and are written before returning.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+
+class CoalescingStateStore:
+    def __init__(self, engine, flush_interval_sec: float = 1.5, sync_keys=(), logger=None):
+        self._engine = engine
+        self.flush_interval_sec = max(0.0, float(flush_interval_sec))
+        self.sync_keys = set(sync_keys or ())
+        self._log = logger
+        self._pending: dict[str, object] = {}
+        self._lock = threading.RLock()
+        self._table_ready = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.stats = {"saves": 0, "writes": 0, "coalesced": 0, "retries": 0}
+
+    def ensure_table(self):
+        if self._table_ready:
+            return
+        with self._lock:
+            if self._table_ready:
+                return
+            ddl = """
+            CREATE TABLE IF NOT EXISTS app_state (
+              key TEXT PRIMARY KEY,
+              value_json TEXT NOT NULL,
+              updated_at TEXT NOT NULL
+            )
+            """
+            with self._engine.begin() as con:
+                con.execute(text(ddl))
+            self._table_ready = True
+
+    def load(self, key, default):
+        key = str(key)
+        with self._lock:
+            if key in self._pending:
+                # Same shape as a DB round-trip: callers get a detached copy.
+                try:
+                    return json.loads(json.dumps(self._pending[key], ensure_ascii=False))
+                except Exception:
+                    pass
+        self.ensure_table()
+        with self._engine.begin() as con:
+            row = con.execute(text("SELECT value_json FROM app_state WHERE key = :k"), {"k": key}).fetchone()
+        if not row:
+            return default
+        try:
+            return json.loads(str(row[0]))
+        except Exception:
+            return default
+
+    def save(self, key, data, sync: bool = False):
+        key = str(key)
+        self.stats["saves"] += 1
+        if sync or key in self.sync_keys or self.flush_interval_sec <= 0:
+            with self._lock:
+                self._pending.pop(key, None)
+            self._write({key: json.dumps(data, ensure_ascii=False)})
+            return
+        with self._lock:
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[key] = data
+        self._ensure_flusher()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = {}
+        payloads = {}
+        for key, data in batch.items():
+            try:
+                payloads[key] = json.dumps(data, ensure_ascii=False)
+            except RuntimeError:
+                # The live object was mutated mid-dump by another thread; retry next tick.
+                self.stats["retries"] += 1
+                with self._lock:
+                    self._pending.setdefault(key, data)
+        if payloads:
+            try:
+                self._write(payloads)
+            except Exception as e:
+                with self._lock:
+                    for key in payloads:
+                        self._pending.setdefault(key, batch[key])
+                if self._log:
+                    self._log("state_flush_failed", keys=len(payloads), error=str(e)[:200])
+                return 0
+        return len(payloads)
+
+    def _write(self, payloads: dict[str, str]):
+        self.ensure_table()
+        now = datetime.now(timezone.utc).isoformat()
+        with self._engine.begin() as con:
+            for key, payload in payloads.items():
+                updated = con.execute(
+                    text("UPDATE app_state SET value_json = :v, updated_at = :u WHERE key = :k"),
+                    {"k": key, "v": payload, "u": now},
+                ).rowcount
+                if not updated:
+                    con.execute(
+                        text("INSERT INTO app_state (key, value_json, updated_at) VALUES (:k, :v, :u)"),
+                        {"k": key, "v": payload, "u": now},
+                    )
+        self.stats["writes"] += len(payloads)
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lumiere-state-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_sec)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                if self._log:
+                    self._log("state_flush_failed", error=str(e)[:200])
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
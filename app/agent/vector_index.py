@@ -0,0 +1,314 @@
+"""CPU-only embeddings and a per-namespace vector index.
+
+`HashingEmbedder` maps text to a fixed-size, L2-normalised vector with the
+signed hashing trick over unigrams and bigrams. It needs no model download and
+no network. Other backends can be registered in `EMBEDDERS`; anything with
+`name`, `dim` and `embed_batch(texts) -> ndarray[n, dim]` works.
+
+`VectorIndex` keeps one matrix per namespace (e.g. `history:<actor>`), stored
+as `<ns>.<generation>.npy` next to a `<ns>.meta.json` holding the generation,
+the row count, row ids and small per-row metadata. The matrix is preallocated
+with spare rows: adds are written in place past the row count, deletes mark
+rows dead in the meta, and only a full or mostly dead matrix is compacted into
+the next generation. Each update writes the meta file once, last, so a reader
+never sees rows the meta does not describe. The matrix is opened with
+`mmap_mode="r"`, so worker processes share the OS page cache instead of each
+loading a copy. Every commit bumps a version number in the meta, and a
+reader reloads when the version differs from the one it cached.
+
+Writers in different worker processes hold a per-namespace `<ns>.lock` file
+lock from the load through the commit, and reload the meta once they hold
+it, so two workers never fill the same spare rows. Scoring is one
+matrix-vector product per query.
+
+NumPy is optional: without it `NUMPY_AVAILABLE` is False and callers keep
+their lexical ranking.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+from app.agent.file_lock import file_lock
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    name = "hashing-v1"
+
+    def __init__(self, dim: int = 384, tokenize=None, bigram_weight: float = 0.5):
+        self.dim = max(16, int(dim))
+        self._tokenize = tokenize or (lambda value: _TOKEN_RE.findall(str(value or "").lower()))
+        self.bigram_weight = float(bigram_weight)
+
+    def _features(self, value: str):
+        tokens = list(self._tokenize(value))
+        for tok in tokens:
+            yield tok, 1.0
+        for a, b in zip(tokens, tokens[1:]):
+            yield f"{a} {b}", self.bigram_weight
+
+    def embed_batch(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, value in enumerate(texts):
+            for feature, weight in self._features(value):
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += weight if (h >> 63) & 1 else -weight
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+EMBEDDERS = {"hashing": HashingEmbedder}
+
+
+def build_embedder(name: str = "hashing", **kwargs):
+    factory = EMBEDDERS.get(str(name or "hashing").strip().lower(), HashingEmbedder)
+    return factory(**kwargs)
+
+
+class VectorIndex:
+    def __init__(self, root: Path, embedder, min_capacity: int = 64):
+        self.root = Path(root)
+        self.embedder = embedder
+        self.min_capacity = max(1, int(min_capacity))
+        self._cache: dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    def _base(self, namespace: str) -> str:
+        kind = re.sub(r"[^a-z0-9]+", "-", str(namespace).split(":", 1)[0].lower()) or "ns"
+        digest = hashlib.sha1(str(namespace).encode("utf-8")).hexdigest()[:16]
+        return f"{kind}-{digest}"
+
+    def _meta_path(self, namespace: str) -> Path:
+        return self.root / f"{self._base(namespace)}.meta.json"
+
+    def _lock_path(self, namespace: str) -> Path:
+        return self.root / f"{self._base(namespace)}.lock"
+
+    def _write_lock(self, namespace: str):
+        self.root.mkdir(parents=True, exist_ok=True)
+        return file_lock(self._lock_path(namespace))
+
+    def _generations(self, namespace: str) -> dict[int, Path]:
+        base = self._base(namespace)
+        out = {}
+        for path in self.root.glob(f"{base}.*.npy"):
+            gen = path.name[len(base) + 1:-len(".npy")]
+            if gen.isdigit():
+                out[int(gen)] = path
+        return out
+
+    def _entry(self, ids, metas, rows: int, file: str | None, gen: int, version: int):
+        if file:
+            matrix = np.load(self.root / file, mmap_mode="r")
+        else:
+            matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        alive = np.fromiter((row_id is not None for row_id in ids), dtype=bool, count=rows)
+        return {"ids": ids, "meta": metas, "rows": rows, "matrix": matrix, "alive": alive, "file": file, "gen": gen, "version": version}
+
+    def _load(self, namespace: str):
+        meta_path = self._meta_path(namespace)
+        cached = self._cache.get(namespace)
+        # A writer may retire the generation named in the meta we just read; re-read once.
+        for _ in range(2):
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                return cached
+            except Exception:
+                return None
+            try:
+                version = int(meta.get("version", 0))
+                if cached is not None and cached["version"] == version:
+                    return cached
+                if meta.get("embedder") != self.embedder.name or int(meta.get("dim", 0)) != self.embedder.dim:
+                    return None
+                rows = int(meta["rows"])
+                ids = list(meta["ids"])
+                metas = list(meta["meta"])
+                if len(ids) != rows or len(metas) != rows:
+                    return None
+                entry = self._entry(ids, metas, rows, meta.get("file"), int(meta.get("gen", 0)), version)
+                if entry["matrix"].shape[0] < rows:
+                    return None
+                break
+            except FileNotFoundError:
+                continue
+            except Exception:
+                return None
+        else:
+            return None
+        self._cache[namespace] = entry
+        return entry
+
+    def _next_version(self, namespace: str) -> int:
+        # For rebuilds, where the meta on disk may be unreadable or stale.
+        try:
+            return int(json.loads(self._meta_path(namespace).read_text(encoding="utf-8")).get("version", 0)) + 1
+        except Exception:
+            return 1
+
+    def _commit(self, namespace: str, ids, metas, rows: int, file: str, gen: int, version: int):
+        # The meta file is written last: readers holding the previous meta
+        # still see a consistent prefix of the same or the previous generation.
+        meta_path = self._meta_path(namespace)
+        tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+        tmp_meta.write_text(
+            json.dumps(
+                {
+                    "embedder": self.embedder.name,
+                    "dim": self.embedder.dim,
+                    "version": version,
+                    "file": file,
+                    "gen": gen,
+                    "rows": rows,
+                    "ids": ids,
+                    "meta": metas,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp_meta, meta_path)
+        for old_gen, path in self._generations(namespace).items():
+            if old_gen < gen - 1:
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    pass  # still mapped elsewhere (Windows); the next compaction retries
+        self._cache[namespace] = self._entry(ids, metas, rows, file, gen, version)
+
+    def _rewrite(self, namespace: str, ids, metas, vectors, version: int, gen: int | None = None):
+        """Write live rows into a new generation with spare capacity."""
+        if gen is None:
+            gen = max(self._generations(namespace), default=-1) + 1
+        rows = len(ids)
+        capacity = max(self.min_capacity, 2 * rows)
+        file = f"{self._base(namespace)}.{gen}.npy"
+        tmp = self.root / (file + ".tmp")
+        matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, self.embedder.dim))
+        if rows:
+            matrix[:rows] = vectors
+        matrix.flush()
+        del matrix
+        os.replace(tmp, self.root / file)
+        self._commit(namespace, list(ids), list(metas), rows, file, gen, version)
+
+    def _update(self, namespace: str, entry, ids, metas, new_ids, new_metas, new_vecs):
+        """Append `new_*` after tombstoning rows set to None in `ids`. Appends
+        go into the current generation's spare rows; the matrix is only
+        rewritten when it is full or mostly tombstones. The caller holds the
+        namespace's write lock and loaded `entry` under it."""
+        rows = entry["rows"]
+        version = entry["version"] + 1
+        n = len(new_ids)
+        dead = sum(1 for row_id in ids if row_id is None)
+        fits = entry["file"] is not None and rows + n <= entry["matrix"].shape[0]
+        if fits and dead <= max(self.min_capacity, rows - dead):
+            if n:
+                matrix = np.lib.format.open_memmap(self.root / entry["file"], mode="r+")
+                matrix[rows:rows + n] = new_vecs
+                matrix.flush()
+                del matrix
+            self._commit(namespace, ids + new_ids, metas + new_metas, rows + n, entry["file"], entry["gen"], version)
+            return
+        keep = [i for i, row_id in enumerate(ids) if row_id is not None]
+        vectors = np.asarray(entry["matrix"][:rows])[keep]
+        if n:
+            vectors = np.vstack([vectors, new_vecs])
+        self._rewrite(namespace, [ids[i] for i in keep] + new_ids, [metas[i] for i in keep] + new_metas, vectors, version, gen=entry["gen"] + 1)
+
+    def has(self, namespace: str) -> bool:
+        with self._lock:
+            return self._load(namespace) is not None
+
+    def entries(self, namespace: str):
+        """Return (ids, metas) currently stored for `namespace`, or None if absent."""
+        with self._lock:
+            entry = self._load(namespace)
+            if entry is None:
+                return None
+            live = [i for i, row_id in enumerate(entry["ids"]) if row_id is not None]
+            return [entry["ids"][i] for i in live], [entry["meta"][i] for i in live]
+
+    def replace(self, namespace: str, items):
+        """Rebuild a namespace from (id, text, meta) tuples."""
+        items = list(items)
+        matrix = self.embedder.embed_batch([t for _, t, _ in items]) if items else np.zeros((0, self.embedder.dim), dtype=np.float32)
+        with self._lock, self._write_lock(namespace):
+            self._rewrite(namespace, [str(i) for i, _, _ in items], [m for _, _, m in items], matrix, self._next_version(namespace))
+
+    def add(self, namespace: str, items, replace_where=None):
+        """Insert or overwrite rows by id. Rows whose meta satisfies
+        `replace_where` are removed in the same update."""
+        items = list(items)
+        new_ids = [str(i) for i, _, _ in items]
+        new_metas = [m for _, _, m in items]
+        new_vecs = self.embedder.embed_batch([t for _, t, _ in items]) if items else None
+        with self._lock, self._write_lock(namespace):
+            entry = self._load(namespace)
+            if entry is None:
+                if items:
+                    self._rewrite(namespace, new_ids, new_metas, new_vecs, self._next_version(namespace))
+                return
+            drop = set(new_ids)
+            ids, metas = list(entry["ids"]), list(entry["meta"])
+            for i, row_id in enumerate(ids):
+                if row_id is not None and (row_id in drop or (replace_where is not None and replace_where(metas[i]))):
+                    ids[i], metas[i] = None, None
+            if items or ids != entry["ids"]:
+                self._update(namespace, entry, ids, metas, new_ids, new_metas, new_vecs)
+
+    def delete(self, namespace: str, ids=None, where=None):
+        """Remove rows whose id is in `ids` or whose meta satisfies `where`."""
+        drop = {str(i) for i in (ids or [])}
+        if not self._meta_path(namespace).exists():
+            return 0
+        with self._lock, self._write_lock(namespace):
+            entry = self._load(namespace)
+            if entry is None:
+                return 0
+            kept_ids, metas = list(entry["ids"]), list(entry["meta"])
+            removed = 0
+            for i, row_id in enumerate(kept_ids):
+                if row_id is not None and (row_id in drop or (where is not None and where(metas[i]))):
+                    kept_ids[i], metas[i] = None, None
+                    removed += 1
+            if removed:
+                self._update(namespace, entry, kept_ids, metas, [], [], None)
+            return removed
+
+    def search(self, namespace: str, query: str, k: int = 8, where=None):
+        """Top-k rows by cosine similarity as (id, score, meta) tuples."""
+        with self._lock:
+            entry = self._load(namespace)
+        if entry is None or not entry["alive"].any():
+            return []
+        rows = entry["rows"]
+        q = self.embedder.embed_batch([query])[0]
+        scores = np.asarray(entry["matrix"][:rows]) @ q
+        mask = entry["alive"]
+        if where is not None:
+            mask = mask & np.fromiter((m is not None and bool(where(m)) for m in entry["meta"]), dtype=bool, count=rows)
+        scores = np.where(mask, scores, -np.inf)
+        k = max(1, min(int(k), rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (entry["ids"][i], float(scores[i]), entry["meta"][i])
+            for i in top
+            if np.isfinite(scores[i]) and scores[i] > 0
+        ]
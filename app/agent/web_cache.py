@@ -0,0 +1,224 @@
+"""Local cache for live web retrieval.
+
+Two kinds of entries share one SQLite table: search result lists (`search`),
+keyed on the whitespace/case-normalized query, and extracted page text
+(`page`), keyed on the URL. Keys are SHA-256 digests of kind + normalized key.
+Each kind has its own TTL. An expired page entry is kept along with its
+ETag / Last-Modified validators, so the next fetch can be a conditional GET;
+a 304 marks it fresh again without downloading or extracting the page.
+
+The table is bounded by total stored bytes and evicts least recently used
+entries first. The table lives in a SQLite file (`LUMIERE_WEB_CACHE_DB`,
+default `datasets/web_cache.db`) shared by every worker on the host, so
+entries and their validators survive restarts.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.agent.llm_cache import parse_site_ttls
+
+_WS_RE = re.compile(r"\s+")
+# The runtime's DATASET_DIR.
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[2] / "datasets" / "web_cache.db"
+
+DEFAULT_KIND_TTLS = {
+    "search": 6 * 3600.0,
+    "page": 24 * 3600.0,
+}
+
+
+def normalize_cache_key(kind: str, key: str) -> str:
+    key = str(key or "").strip()
+    if kind == "search":
+        key = _WS_RE.sub(" ", key).lower()
+    return key
+
+
+def web_cache_key(kind: str, key: str) -> str:
+    digest = hashlib.sha256(f"{kind}|{normalize_cache_key(kind, key)}".encode("utf-8")).hexdigest()
+    return f"{kind}:{digest}"
+
+
+@dataclass
+class CachedEntry:
+    value: str
+    fresh: bool
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class WebCache:
+    def __init__(self, db_path, kind_ttls: dict | None = None, max_bytes: int = 64 * 1024 * 1024, clock=None):
+        self.db_path = str(db_path)
+        self.kind_ttls = {**DEFAULT_KIND_TTLS, **(kind_ttls or {})}
+        self.max_bytes = max(1024, int(max_bytes))
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        # One connection behind a lock: fetch workers share it, and an
+        # in-memory database only exists on the connection that created it.
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(self.db_path, timeout=2.0, check_same_thread=False)
+        if self.db_path != ":memory:":
+            self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS web_cache (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, "
+            "etag TEXT, last_modified TEXT, expires_at REAL NOT NULL, used_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS ix_web_cache_used ON web_cache (used_at)")
+        self._con.commit()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._kind_stats: dict[str, dict] = {}
+
+    def ttl_for(self, kind: str) -> float:
+        return float(self.kind_ttls.get(kind, 0.0) or 0.0)
+
+    def _count(self, kind: str, field: str):
+        self._stats[field] += 1
+        row = self._kind_stats.setdefault(kind, {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0})
+        if field in row:
+            row[field] += 1
+
+    def get(self, kind: str, key: str) -> CachedEntry | None:
+        """The entry for `key`, fresh or not. Expired entries are returned
+        (and counted as stale) only if they can be revalidated."""
+        cache_key = web_cache_key(kind, key)
+        now = self._clock()
+        with self._lock:
+            try:
+                row = self._con.execute(
+                    "SELECT value, etag, last_modified, expires_at FROM web_cache WHERE key = ?", (cache_key,)
+                ).fetchone()
+                if row is not None:
+                    self._con.execute("UPDATE web_cache SET used_at = ? WHERE key = ?", (now, cache_key))
+                    self._con.commit()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self._count(kind, "misses")
+                return None
+            entry = CachedEntry(row[0], float(row[3]) > now, row[1], row[2])
+            if entry.fresh:
+                self._count(kind, "hits")
+                return entry
+            if entry.revalidatable:
+                self._count(kind, "stale")
+                return entry
+            self._count(kind, "misses")
+            return None
+
+    def put(self, kind: str, key: str, value: str, etag: str | None = None, last_modified: str | None = None, ttl: float | None = None) -> bool:
+        ttl = self.ttl_for(kind) if ttl is None else float(ttl)
+        text = str(value or "")
+        if ttl <= 0:
+            return False
+        now = self._clock()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            try:
+                self._con.execute(
+                    "INSERT OR REPLACE INTO web_cache (key, kind, value, etag, last_modified, expires_at, used_at, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (web_cache_key(kind, key), kind, text, etag or None, last_modified or None, now + ttl, now, size),
+                )
+                self._evict()
+                self._con.commit()
+            except sqlite3.Error:
+                return False
+            self._stats["stores"] += 1
+        return True
+
+    def refresh(self, kind: str, key: str, ttl: float | None = None) -> bool:
+        """Mark a revalidated (304) entry fresh for another TTL."""
+        ttl = self.ttl_for(kind) if ttl is None else float(ttl)
+        now = self._clock()
+        with self._lock:
+            try:
+                cur = self._con.execute(
+                    "UPDATE web_cache SET expires_at = ?, used_at = ? WHERE key = ?", (now + ttl, now, web_cache_key(kind, key))
+                )
+                self._con.commit()
+            except sqlite3.Error:
+                return False
+            if cur.rowcount:
+                self._count(kind, "revalidated")
+            return bool(cur.rowcount)
+
+    def _evict(self):
+        # Caller holds the lock.
+        total = int(self._con.execute("SELECT COALESCE(SUM(size), 0) FROM web_cache").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        for key, size in self._con.execute("SELECT key, size FROM web_cache ORDER BY used_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._con.execute("DELETE FROM web_cache WHERE key = ?", (key,))
+            total -= int(size)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            try:
+                self._con.execute("DELETE FROM web_cache")
+                self._con.commit()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        with self._lock:
+            try:
+                self._con.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            try:
+                entries, size = self._con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM web_cache").fetchone()
+            except sqlite3.Error:
+                entries, size = None, None
+            lookups = self._stats["hits"] + self._stats["misses"] + self._stats["stale"]
+            return {
+                **self._stats,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round((self._stats["hits"] + self._stats["revalidated"]) / lookups, 4) if lookups else None,
+                "disk_tier": self.db_path != ":memory:",
+                "kinds": {
+                    kind: {**row, "ttl_sec": self.ttl_for(kind)}
+                    for kind, row in sorted(self._kind_stats.items())
+                },
+            }
+
+
+_SHARED_CACHE = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_web_cache() -> WebCache | None:
+    """Process-wide cache configured from `LUMIERE_WEB_CACHE*` env vars, or
+    None when `LUMIERE_WEB_CACHE` turns it off."""
+    global _SHARED_CACHE
+    if str(os.getenv("LUMIERE_WEB_CACHE", "true")).strip().lower() not in {"1", "true", "yes", "on"}:
+        return None
+    with _SHARED_LOCK:
+        if _SHARED_CACHE is None:
+            _SHARED_CACHE = WebCache(
+                db_path=os.getenv("LUMIERE_WEB_CACHE_DB", "").strip() or DEFAULT_DB_PATH,
+                kind_ttls=parse_site_ttls(os.getenv("LUMIERE_WEB_CACHE_TTLS", "")),
+                max_bytes=max(1024, int(os.getenv("LUMIERE_WEB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))),
+            )
+        return _SHARED_CACHE
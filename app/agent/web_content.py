@@ -1,24 +1,107 @@
 from __future__ import annotations
 
+import concurrent.futures
+import json
+import os
 import re
+import threading
 import urllib.parse
 import urllib.request
 from html import unescape as html_unescape
+from html.parser import HTMLParser
+from typing import NamedTuple
 from urllib.error import HTTPError, URLError
 
+from app.agent.deadline import Deadline, stage_timeout
+from app.agent.passage_rank import select_passages
+from app.agent.search_providers import SearchProvider
+from app.agent.web_cache import shared_web_cache
 
-def http_get_text(url: str, timeout: int = 10) -> str:
-    req = urllib.request.Request(
-        url,
-        headers={
-            "User-Agent": "Mozilla/5.0",
-            "Accept-Language": "en-US,en;q=0.9",
-        },
-    )
+# Below this many seconds a stage is not worth starting.
+MIN_FETCH_SEC = 1.5
+MIN_ANSWER_SEC = 4.0
+
+PAGE_FETCH_TIMEOUT_SEC = 8.0
+WEB_FETCH_WORKERS = max(1, int(os.getenv("LUMIERE_WEB_FETCH_WORKERS", "8")))
+WEB_FETCH_MAX_BYTES = max(16 * 1024, int(os.getenv("LUMIERE_WEB_FETCH_MAX_BYTES", str(512 * 1024))))
+WEB_PAGE_TEXT_CHARS = max(1000, int(os.getenv("LUMIERE_WEB_PAGE_TEXT_CHARS", "12000")))
+WEB_PASSAGES_PER_SOURCE = max(1, int(os.getenv("LUMIERE_WEB_PASSAGES_PER_SOURCE", "3")))
+WEB_PASSAGE_CHARS = max(500, int(os.getenv("LUMIERE_WEB_PASSAGE_CHARS", "4800")))
+_READ_CHUNK_BYTES = 64 * 1024
+_NON_TEXT_TYPES = ("image/", "audio/", "video/", "application/pdf", "application/zip", "application/octet-stream")
+
+_FETCH_POOL: concurrent.futures.ThreadPoolExecutor | None = None
+_FETCH_POOL_LOCK = threading.Lock()
+
+
+def _fetch_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _FETCH_POOL
+    with _FETCH_POOL_LOCK:
+        if _FETCH_POOL is None:
+            _FETCH_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=WEB_FETCH_WORKERS, thread_name_prefix="lumiere-web-fetch")
+        return _FETCH_POOL
+
+
+class HttpResponse(NamedTuple):
+    status: int
+    text: str
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+def http_get(
+    url: str,
+    timeout: float = 10,
+    max_bytes: int | None = None,
+    deadline: Deadline | None = None,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> HttpResponse:
+    """GET `url` as text, reading at most `max_bytes` (default
+    `WEB_FETCH_MAX_BYTES`) and stopping early, with what arrived, once
+    `deadline` expires. Non-text responses are rejected unread. With `etag` /
+    `last_modified` the request is conditional and may return status 304."""
+    headers = {
+        "User-Agent": "Mozilla/5.0",
+        "Accept-Language": "en-US,en;q=0.9",
+    }
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    req = urllib.request.Request(url, headers=headers)
+    limit = WEB_FETCH_MAX_BYTES if max_bytes is None else max(1, int(max_bytes))
     opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
-    with opener.open(req, timeout=timeout) as resp:
+    try:
+        resp = opener.open(req, timeout=timeout)
+    except HTTPError as e:
+        if e.code == 304:
+            return HttpResponse(304, "", etag, last_modified)
+        raise
+    with resp:
+        content_type = str(resp.headers.get("Content-Type") or "").lower()
+        if content_type.startswith(_NON_TEXT_TYPES):
+            raise ValueError(f"non-text content: {content_type}")
         charset = resp.headers.get_content_charset() or "utf-8"
-        return resp.read().decode(charset, errors="replace")
+        chunks, size = [], 0
+        while size < limit:
+            chunk = resp.read(min(_READ_CHUNK_BYTES, limit - size))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if deadline is not None and deadline.expired():
+                break
+        return HttpResponse(
+            int(getattr(resp, "status", 200) or 200),
+            b"".join(chunks).decode(charset, errors="replace"),
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+        )
+
+
+def http_get_text(url: str, timeout: float = 10, max_bytes: int | None = None, deadline: Deadline | None = None) -> str:
+    return http_get(url, timeout=timeout, max_bytes=max_bytes, deadline=deadline).text
 
 
 def _clean_html_fragment(raw: str) -> str:
@@ -26,14 +109,61 @@ def _clean_html_fragment(raw: str) -> str:
     return html_unescape(" ".join(cleaned.split())).strip()
 
 
-def _extract_page_text(html: str, max_chars: int = 5000) -> str:
-    text = re.sub(r"(?is)<script.*?>.*?</script>", " ", html or "")
-    text = re.sub(r"(?is)<style.*?>.*?</style>", " ", text)
-    text = re.sub(r"(?is)<noscript.*?>.*?</noscript>", " ", text)
-    text = re.sub(r"(?is)<[^>]+>", " ", text)
-    text = html_unescape(text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text[:max_chars]
+class _PageTextParser(HTMLParser):
+    """Collects visible text, skipping script/style-like subtrees, until
+    `max_chars` characters of collapsed text are gathered."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: list[str] = []
+        self.size = 0
+        self.done = False
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        words = data.split()
+        if not words:
+            return
+        piece = " ".join(words)
+        self.parts.append(piece)
+        self.size += len(piece) + 1
+        if self.size >= self.max_chars:
+            self.done = True
+
+
+def _extract_page_text(html: str, max_chars: int = 5000, chunk_chars: int = 16 * 1024) -> str:
+    """Visible text of `html`, whitespace-collapsed and cut at `max_chars`.
+    The page is parsed incrementally and parsing stops once enough text
+    has been collected, so the rest of a large page is never scanned."""
+    html = html or ""
+    parser = _PageTextParser(max_chars)
+    try:
+        for start in range(0, len(html), chunk_chars):
+            parser.feed(html[start:start + chunk_chars])
+            if parser.done:
+                break
+        else:
+            parser.close()
+    except Exception:
+        # HTMLParser is lenient, but keep whatever text was collected.
+        pass
+    return " ".join(parser.parts)[:max_chars]
 
 
 def _unwrap_duckduckgo_link(url: str) -> str:
@@ -46,11 +176,48 @@ def _unwrap_duckduckgo_link(url: str) -> str:
     return url
 
 
-def duckduckgo_search(query: str, max_results: int = 5) -> list[dict[str, str]]:
+def duckduckgo_search(query: str, max_results: int = 5, deadline: Deadline | None = None) -> list[dict[str, str]]:
+    """Search results for `query`, served from the web cache when a fresh
+    list for the same normalized query is stored."""
+    cache = shared_web_cache()
+    cache_key = f"{int(max_results)}|{query}"
+    if cache is not None:
+        entry = cache.get("search", cache_key)
+        if entry is not None and entry.fresh:
+            try:
+                return json.loads(entry.value)
+            except ValueError:
+                pass
+    out = _scrape_duckduckgo(query, max_results, deadline)
+    if cache is not None and out:
+        cache.put("search", cache_key, json.dumps(out))
+    return out
+
+
+class DuckDuckGoProvider(SearchProvider):
+    name = "duckduckgo"
+
+    def search(self, query: str, max_results: int = 5, deadline: Deadline | None = None) -> list[dict]:
+        return duckduckgo_search(query, max_results=max_results, deadline=deadline)
+
+
+_SEARCH_PROVIDER: SearchProvider = DuckDuckGoProvider()
+
+
+def set_search_provider(provider: SearchProvider):
+    global _SEARCH_PROVIDER
+    _SEARCH_PROVIDER = provider
+
+
+def search_provider() -> SearchProvider:
+    return _SEARCH_PROVIDER
+
+
+def _scrape_duckduckgo(query: str, max_results: int = 5, deadline: Deadline | None = None) -> list[dict[str, str]]:
     encoded_q = urllib.parse.quote_plus(query)
     lite_url = f"https://lite.duckduckgo.com/lite/?q={encoded_q}"
     try:
-        lite_html = http_get_text(lite_url, timeout=10)
+        lite_html = http_get_text(lite_url, timeout=stage_timeout(deadline, 10))
     except Exception:
         lite_html = ""
 
@@ -82,10 +249,12 @@ def duckduckgo_search(query: str, max_results: int = 5) -> list[dict[str, str]]:
                 break
     if out:
         return out
+    if deadline is not None and not deadline.allows(MIN_FETCH_SEC):
+        return out
 
     search_url = f"https://duckduckgo.com/html/?q={encoded_q}"
     try:
-        html = http_get_text(search_url, timeout=10)
+        html = http_get_text(search_url, timeout=stage_timeout(deadline, 10))
     except Exception:
         return []
 
@@ -112,30 +281,119 @@ def duckduckgo_search(query: str, max_results: int = 5) -> list[dict[str, str]]:
     return out
 
 
-def live_web_answer(question: str, ask_llm_fn, max_sources: int = 3, extra_context: str = ""):
-    results = duckduckgo_search(question, max_results=6)
-    if not results:
-        return None, []
+def fetch_page_text(url: str, deadline: Deadline, max_chars: int = WEB_PAGE_TEXT_CHARS) -> str:
+    """Extracted text of `url`. A fresh cached copy is used as is; a stale
+    one with validators is revalidated with a conditional GET. Entries are
+    keyed on `max_chars` too, since extraction stops at that length."""
+    cache = shared_web_cache()
+    cache_key = f"{int(max_chars)}|{url}"
+    entry = cache.get("page", cache_key) if cache is not None else None
+    if entry is not None and entry.fresh:
+        return entry.value
+    resp = http_get(
+        url,
+        timeout=deadline.timeout(PAGE_FETCH_TIMEOUT_SEC),
+        deadline=deadline,
+        etag=entry.etag if entry is not None else None,
+        last_modified=entry.last_modified if entry is not None else None,
+    )
+    if resp.status == 304 and entry is not None:
+        cache.refresh("page", cache_key)
+        return entry.value
+    page_text = _extract_page_text(resp.text, max_chars=max_chars)
+    if cache is not None and not deadline.expired():
+        # A read cut short by the deadline is not the whole page; don't keep it.
+        cache.put("page", cache_key, page_text, etag=resp.etag, last_modified=resp.last_modified)
+    return page_text
 
-    sources = []
-    for item in results:
-        try:
-            page_html = http_get_text(item["url"], timeout=8)
-            page_text = _extract_page_text(page_html, max_chars=3200)
-            if len(page_text) < 240:
-                continue
-            sources.append({
-                "title": item["title"],
-                "url": item["url"],
-                "snippet": item["snippet"],
-                "content": page_text,
-            })
-            if len(sources) >= max_sources:
+
+def _inline_source(item):
+    # Providers with local documents return their text; nothing to fetch.
+    return {
+        "title": item["title"],
+        "url": item["url"],
+        "snippet": item.get("snippet", ""),
+        "content": str(item["content"])[:WEB_PAGE_TEXT_CHARS],
+    }
+
+
+def _fetch_page_source(item, fetch_deadline: Deadline):
+    if not fetch_deadline.allows(MIN_FETCH_SEC):
+        return None
+    try:
+        page_text = fetch_page_text(item["url"], fetch_deadline)
+    except (HTTPError, URLError, TimeoutError, ValueError):
+        return None
+    except Exception:
+        return None
+    if len(page_text) < 240:
+        return None
+    return {
+        "title": item["title"],
+        "url": item["url"],
+        "snippet": item["snippet"],
+        "content": page_text,
+    }
+
+
+def _fetch_pages(results, max_sources: int, deadline: Deadline | None = None):
+    """Fetch result pages concurrently; stop once `max_sources` good pages
+    arrived or the fetch stage (one page timeout, and never the time the
+    answer needs) runs out. Sources keep search-rank order."""
+    found = {rank: _inline_source(item) for rank, item in enumerate(results) if item.get("content")}
+    remote = [(rank, item) for rank, item in enumerate(results) if not item.get("content")]
+    budget = PAGE_FETCH_TIMEOUT_SEC
+    if deadline is not None:
+        budget = min(budget, deadline.remaining() - MIN_ANSWER_SEC)
+    if not remote or len(found) >= max_sources or budget < MIN_FETCH_SEC:
+        # Short on time, keep the rest of the budget for the answer; snippets fill in.
+        return [found[rank] for rank in sorted(found)][:max_sources]
+    fetch_deadline = Deadline(budget) if deadline is None else deadline.within(budget)
+    pool = _fetch_pool()
+    pending = {pool.submit(_fetch_page_source, item, fetch_deadline): rank for rank, item in remote}
+    try:
+        while pending and len(found) < max_sources:
+            done, _ = concurrent.futures.wait(pending, timeout=fetch_deadline.remaining(), return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
                 break
-        except (HTTPError, URLError, TimeoutError, ValueError):
-            continue
-        except Exception:
+            for future in done:
+                rank = pending.pop(future)
+                source = future.result()
+                if source:
+                    found[rank] = source
+    finally:
+        # Queued fetches are dropped; running ones end at their timeout or byte cap.
+        for future in pending:
+            future.cancel()
+    return [found[rank] for rank in sorted(found)][:max_sources]
+
+
+def rank_source_passages(question: str, sources, per_source: int = WEB_PASSAGES_PER_SOURCE, total_chars: int = WEB_PASSAGE_CHARS):
+    """Replace each source's page text with its passages most relevant to
+    `question`. `passages` records their offsets into the page text."""
+    picks = select_passages(question, [s["content"] for s in sources], per_source=per_source, total_chars=total_chars)
+    ranked = []
+    for source, chosen in zip(sources, picks):
+        if not chosen:
             continue
+        text = source["content"]
+        ranked.append({
+            **source,
+            "content": " ... ".join(text[p["start"]:p["end"]].strip() for p in chosen),
+            "passages": chosen,
+            "content_chars": len(text),
+        })
+    return ranked
+
+
+def gather_live_web_sources(question: str, max_sources: int = 3, deadline: Deadline | None = None):
+    results = search_provider().search(question, max_results=6, deadline=deadline)
+    if not results:
+        return []
+
+    sources = _fetch_pages(results, max_sources, deadline)
+    if sources:
+        sources = rank_source_passages(question, sources)
 
     if not sources:
         for item in results[:max_sources]:
@@ -148,9 +406,10 @@ def live_web_answer(question: str, ask_llm_fn, max_sources: int = 3, extra_conte
                 "snippet": snippet,
                 "content": f"Snippet source: {snippet}",
             })
-        if not sources:
-            return None, []
+    return sources
+
 
+def build_live_web_prompt(question: str, sources, extra_context: str = ""):
     source_blocks = []
     for i, s in enumerate(sources, start=1):
         source_blocks.append(
@@ -159,7 +418,7 @@ def live_web_answer(question: str, ask_llm_fn, max_sources: int = 3, extra_conte
 
     extra_context_block = f"Extra context:\n{extra_context}" if extra_context else ""
 
-    prompt = f"""
+    return f"""
 You are Lumiere. Use the web sources below to answer the user.
 Rules:
 - Prefer source-grounded statements.
@@ -172,7 +431,13 @@ User question: {question}
 
 {chr(10).join(source_blocks)}
 """
-    answer_plain = ask_llm_fn(prompt)
-    return answer_plain, sources
 
 
+def live_web_answer(question: str, ask_llm_fn, max_sources: int = 3, extra_context: str = "", deadline: Deadline | None = None):
+    sources = gather_live_web_sources(question, max_sources=max_sources, deadline=deadline)
+    if not sources:
+        return None, []
+    if deadline is not None and not deadline.allows(MIN_ANSWER_SEC):
+        return None, sources
+    answer_plain = ask_llm_fn(build_live_web_prompt(question, sources, extra_context=extra_context))
+    return answer_plain, sources
@@ -35,8 +35,7 @@ def register_auth_routes(app, ctx):
             "tenant_id": tenant_id,
             "created_at": ctx["now_iso"](),
         }
-        ctx["users_state"].setdefault("users", []).append(row)
-        ctx["save_users"]()
+        ctx["register_user"](row)
         ctx["audit_log"]("auth_register", username, metadata={"role": role, "tenant_id": tenant_id}, tenant_id=tenant_id)
         return {"status": "ok", "user": {"username": username, "role": role, "tenant_id": tenant_id}}
 
@@ -48,15 +47,7 @@ def register_auth_routes(app, ctx):
         if not user or user.get("password_hash") != ctx["password_hash"](password):
             ctx["audit_log"]("auth_login", username or "unknown", status="denied", metadata={"reason": "invalid_credentials"})
             return {"error": "Invalid credentials"}
-        token = str(uuid4())
-        expires_at = (datetime.now(timezone.utc) + timedelta(hours=ctx["AUTH_SESSION_TTL_HOURS"])).isoformat()
-        ctx["auth_sessions_state"].setdefault("sessions", {})[token] = {
-            "username": user.get("username"),
-            "created_at": ctx["now_iso"](),
-            "last_seen_at": ctx["now_iso"](),
-            "expires_at": expires_at,
-        }
-        ctx["save_auth_sessions"]()
+        token, expires_at = ctx["create_auth_session"](user.get("username"))
         ctx["audit_log"]("auth_login", user.get("username"), metadata={"role": user.get("role")}, tenant_id=user.get("tenant_id", "default"))
         return {
             "status": "ok",
@@ -70,22 +61,17 @@ def register_auth_routes(app, ctx):
         ctx_row = ctx["auth_context_from_token"](x_auth_token)
         if not ctx_row:
             return {"error": "Invalid or expired token"}
-        tok = ctx_row["token"]
-        row = ctx["auth_sessions_state"].get("sessions", {}).get(tok)
-        if not isinstance(row, dict):
+        expires_at = ctx["refresh_auth_session"](ctx_row["token"])
+        if not expires_at:
             return {"error": "Invalid or expired token"}
-        row["expires_at"] = (datetime.now(timezone.utc) + timedelta(hours=ctx["AUTH_SESSION_TTL_HOURS"])).isoformat()
-        row["last_seen_at"] = ctx["now_iso"]()
-        ctx["save_auth_sessions"]()
-        return {"status": "ok", "expires_at": row["expires_at"]}
+        return {"status": "ok", "expires_at": expires_at}
 
     @app.post("/auth/logout")
     async def auth_logout(x_auth_token: Optional[str] = Header(default=None, alias="X-Auth-Token")):
         ctx_row = ctx["auth_context_from_token"](x_auth_token)
         if not ctx_row:
             return {"error": "Invalid token"}
-        ctx["auth_sessions_state"].get("sessions", {}).pop(ctx_row["token"], None)
-        ctx["save_auth_sessions"]()
+        ctx["revoke_auth_session"](ctx_row["token"])
         ctx["audit_log"]("auth_logout", ctx_row["username"], tenant_id=ctx_row.get("tenant_id", "default"))
         return {"status": "ok"}
 
@@ -119,11 +105,20 @@ def register_auth_routes(app, ctx):
         return {"status": "ok", "auth_required": desired}
 
     @app.get("/audit/logs")
-    async def get_audit_logs(limit: int = 100, x_auth_token: Optional[str] = Header(default=None, alias="X-Auth-Token")):
+    async def get_audit_logs(
+        limit: int = 100,
+        before: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        actor: Optional[str] = None,
+        x_auth_token: Optional[str] = Header(default=None, alias="X-Auth-Token"),
+    ):
         auth_ctx = ctx["auth_context_from_token"](x_auth_token)
         if not auth_ctx or auth_ctx.get("role") != "admin":
             return {"error": "Admin token required"}
-        return {"items": ctx["load_audit_logs"](limit)}
+        cap = max(1, min(1000, int(limit or 100)))
+        items = ctx["load_audit_logs"](cap, before=before, tenant_id=tenant_id, actor=actor)
+        next_before = ctx["audit_cursor"](items[-1]) if len(items) >= cap else None
+        return {"items": items, "next_before": next_before}
 
 FORGE_AGENT_DEFAULTS = {
     "idea_validation": {"name": "Idea Validation Agent", "weight": 0.18},
@@ -806,12 +801,14 @@ def register_memory_reminder_routes(app, ctx):
         return {"status": "ok", "requester": acting_as, "active_scopes": updated.get("active_scopes", [])}
 
     @app.get("/memory/items")
-    async def list_memory_items(requester: Optional[str] = None, scope: str = "", x_auth_token: Optional[str] = Header(default=None, alias="X-Auth-Token")):
+    async def list_memory_items(requester: Optional[str] = None, scope: str = "", q: str = "", x_auth_token: Optional[str] = Header(default=None, alias="X-Auth-Token")):
         acting_as, auth_err, _ = ctx["resolve_requester_with_auth"](requester, x_auth_token, allow_admin_impersonate=True)
         if auth_err:
             return {"error": auth_err}
         scopes = [scope] if str(scope).strip() else []
         items = ctx["get_memory_items_for_actor"](acting_as, scopes=scopes if scopes else None)
+        if str(q).strip():
+            items = ctx["rank_memory_items"](acting_as, q, items)
         return {"requester": acting_as, "items": items}
 
     @app.post("/memory/items")
@@ -5,12 +5,23 @@ from typing import Any
 
 import httpx
 
+from app.agent.llm_cache import shared_response_cache
+
 
 GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 DEFAULT_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
 
-def generate_ai_response(messages: list[dict[str, str]], temperature: float = 0.7) -> str:
+def generate_ai_response(messages: list[dict[str, str]], temperature: float = 0.7, cache_site: str | None = None) -> str:
+    """Call Groq; with `cache_site`, repeat prompts are served from the response cache."""
+    if cache_site:
+        return shared_response_cache().call(
+            cache_site,
+            DEFAULT_MODEL,
+            messages,
+            temperature,
+            lambda: generate_ai_response(messages, temperature=temperature),
+        )
     api_key = os.getenv("GROQ_API_KEY", "")
     if not api_key:
         raise ValueError("GROQ_API_KEY is not configured.")
@@ -49,6 +60,7 @@ def generate_milestones_from_idea(idea: str) -> list[str]:
             {"role": "user", "content": prompt},
         ],
         temperature=0.7,
+        cache_site="milestones",
     )
     milestones = [line.strip("- ").strip() for line in content.splitlines() if line.strip()]
     return milestones[:10]
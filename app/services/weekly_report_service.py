@@ -67,6 +67,7 @@ def generate_founder_report(db: Session, user_id: int) -> WeeklyReport:
             {"role": "user", "content": prompt},
         ],
         temperature=0.4,
+        cache_site="weekly_report",
     )
 
     summary = ""
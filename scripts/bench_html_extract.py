@@ -0,0 +1,115 @@
+"""Compare the regex and streaming HTML-to-text extractors over saved pages.
+
+The regex extractor (the previous `_extract_page_text`) runs four
+whole-document substitutions, unescapes and collapses whitespace before
+truncating. The streaming extractor parses incrementally and stops once
+`max_chars` characters of text are collected.
+
+--corpus is a directory of saved pages (*.html / *.htm, searched
+recursively). It defaults to scripts/bench_pages, a small set of saved pages
+covering a news article, a docs page, a server-rendered blog post with its
+JSON payload, a CMS listing and a forum thread. --synthetic instead
+generates script-heavy pages of increasing size, to see how each extractor
+scales. The corpus used is printed with the results.
+
+Usage:
+    py scripts/bench_html_extract.py --corpus ./saved_pages --max-chars 3200 --repeat 5
+    py scripts/bench_html_extract.py --synthetic
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from html import unescape as html_unescape
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.agent.web_content import _extract_page_text  # noqa: E402
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "bench_pages"
+
+
+def regex_extract(html: str, max_chars: int = 5000) -> str:
+    text = re.sub(r"(?is)<script.*?>.*?</script>", " ", html or "")
+    text = re.sub(r"(?is)<style.*?>.*?</style>", " ", text)
+    text = re.sub(r"(?is)<noscript.*?>.*?</noscript>", " ", text)
+    text = re.sub(r"(?is)<[^>]+>", " ", text)
+    text = html_unescape(text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text[:max_chars]
+
+
+def synthetic_corpus() -> list[tuple[str, str]]:
+    pages = []
+    for kb in (20, 100, 500, 2000):
+        script = "<script>window.__DATA__ = " + '{"k": "v"}, ' * 40 + ";</script>\n"
+        style = "<style>.c { margin: 0 auto; padding: 4px }</style>\n"
+        para = "<p>Founders validate demand by talking to <a href='#'>customers</a> &amp; shipping small tests.</p>\n"
+        body, unit = [], script + style + para * 4
+        while sum(len(x) for x in body) < kb * 1024:
+            body.append(unit)
+        pages.append((f"synthetic-{kb}kb", f"<html><head><title>Page</title></head><body>{''.join(body)}</body></html>"))
+    return pages
+
+
+def load_corpus(directory: str) -> list[tuple[str, str]]:
+    root = Path(directory)
+    files = sorted(p for p in root.rglob("*") if p.suffix.lower() in {".html", ".htm"})
+    return [(str(p.relative_to(root)), p.read_text(encoding="utf-8", errors="replace")) for p in files]
+
+
+def time_extractor(fn, html: str, max_chars: int, repeat: int) -> tuple[float, str]:
+    best, out = float("inf"), ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(html, max_chars=max_chars)
+        best = min(best, (time.perf_counter() - started) * 1000.0)
+    return best, out
+
+
+def word_overlap(a: str, b: str) -> float:
+    wa, wb = set(a.split()), set(b.split())
+    return len(wa & wb) / len(wa | wb) if (wa or wb) else 1.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--synthetic", action="store_true", help="benchmark generated pages instead of --corpus")
+    parser.add_argument("--max-chars", type=int, default=3200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = synthetic_corpus() if args.synthetic else load_corpus(args.corpus)
+    if not pages:
+        print(f"No .html/.htm files under {args.corpus}")
+        return 1
+    corpus = "synthetic" if args.synthetic else str(Path(args.corpus).resolve())
+    print(f"corpus: {corpus} ({len(pages)} pages)")
+
+    regex_ms, stream_ms, overlaps = [], [], []
+    print(f"{'page':<40} {'kb':>7} {'regex_ms':>9} {'stream_ms':>10} {'overlap':>8}")
+    for name, html in pages:
+        r_ms, r_text = time_extractor(regex_extract, html, args.max_chars, args.repeat)
+        s_ms, s_text = time_extractor(_extract_page_text, html, args.max_chars, args.repeat)
+        overlap = word_overlap(r_text, s_text)
+        regex_ms.append(r_ms)
+        stream_ms.append(s_ms)
+        overlaps.append(overlap)
+        print(f"{name[:40]:<40} {len(html) / 1024:>7.1f} {r_ms:>9.2f} {s_ms:>10.2f} {overlap:>8.2f}")
+
+    print(f"pages={len(pages)} max_chars={args.max_chars} repeat={args.repeat} (best of repeat)")
+    print(f"regex : median_ms={statistics.median(regex_ms):.2f} total_ms={sum(regex_ms):.1f}")
+    print(f"stream: median_ms={statistics.median(stream_ms):.2f} total_ms={sum(stream_ms):.1f}")
+    if sum(stream_ms):
+        print(f"regex/stream total: {sum(regex_ms) / sum(stream_ms):.2f}x  mean word overlap: {statistics.fmean(overlaps):.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
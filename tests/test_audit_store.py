@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from app.agent.audit_store import AuditLogStore, audit_cursor
+
+
+def _row(i, ts, actor="alice", tenant="default"):
+    return {"id": f"id-{i:03d}", "ts": ts, "event_type": "ask", "actor": actor, "tenant_id": tenant, "status": "ok", "metadata": {"i": i}}
+
+
+def test_batched_append_and_keyset_pages(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    store = AuditLogStore(engine, batch_size=4, flush_interval_sec=3600)
+    base = datetime(2026, 10, 1, 12, 0, 0)
+    for i in range(10):
+        store.append(_row(i, (base + timedelta(seconds=i)).isoformat() + "Z", actor="alice" if i % 2 else "bob"))
+
+    first = store.query(limit=4)
+    assert [r["id"] for r in first] == ["id-009", "id-008", "id-007", "id-006"]
+    assert first[0]["metadata"] == {"i": 9}
+    second = store.query(limit=4, before=audit_cursor(first[-1]))
+    assert [r["id"] for r in second] == ["id-005", "id-004", "id-003", "id-002"]
+    assert [r["id"] for r in store.query(limit=10, actor="bob")][:2] == ["id-008", "id-006"]
+    store.close()
+
+
+def test_retention_prunes_old_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    store = AuditLogStore(engine, retention_days=30, flush_interval_sec=3600)
+    now = datetime(2026, 10, 16, 9, 0, 0)
+    store.import_rows([
+        _row(1, (now - timedelta(days=45)).isoformat() + "Z"),
+        _row(2, (now - timedelta(days=2)).isoformat() + "Z"),
+    ])
+    assert store.prune(now=now) == 1
+    assert [r["id"] for r in store.query()] == ["id-002"]
+    store.close()
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+from app.agent.auth_store import AuthSessionStore, token_hash
+
+
+def _iso(hours):
+    return (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
+
+
+def _last_seen(engine, token):
+    with engine.begin() as con:
+        return con.execute(
+            text("SELECT last_seen_at FROM auth_sessions WHERE token_hash = :h"),
+            {"h": token_hash(token)},
+        ).scalar()
+
+
+def test_sessions_are_hashed_cached_and_touch_is_throttled(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    store = AuthSessionStore(engine, cache_ttl_sec=60, touch_interval_sec=3600)
+    store.create("tok-1", "Alice", _iso(1), now="2026-10-01T00:00:00+00:00")
+
+    with engine.begin() as con:
+        assert con.execute(text("SELECT COUNT(*) FROM auth_sessions WHERE token_hash = 'tok-1'")).scalar() == 0
+    assert store.get("tok-1")["username"] == "Alice"
+    assert store.get("missing") is None
+
+    assert store.touch("tok-1", now="2026-10-01T00:00:05+00:00") is False
+    assert _last_seen(engine, "tok-1") == "2026-10-01T00:00:00+00:00"
+    assert store.get("tok-1")["last_seen_at"] == "2026-10-01T00:00:05+00:00"
+    assert store.flush() == 1
+    assert _last_seen(engine, "tok-1") == "2026-10-01T00:00:05+00:00"
+
+    assert store.refresh("tok-1", _iso(2))
+    assert store.revoke("tok-1")
+    assert store.get("tok-1") is None
+
+
+def test_prune_expired_and_revoke_user(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    store = AuthSessionStore(engine)
+    store.create("old", "alice", _iso(-1))
+    store.create("new", "alice", _iso(1))
+    assert store.import_sessions({"legacy": {"username": "Bob", "expires_at": _iso(1)}, "bad": "x"}) == 1
+
+    assert store.prune() == 1
+    assert store.count() == 2
+    assert sorted(store.usernames()) == ["alice", "bob"]
+    assert store.revoke_user("BOB") == 1
+    assert store.get("legacy") is None
+    assert store.get("new")["username"] == "alice"
@@ -0,0 +1,46 @@
+from app.agent import web_content
+from app.agent.deadline import Deadline, stage_timeout
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_caps_stage_timeouts_and_gates_optional_work():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.timeout(4) == 4
+    assert stage_timeout(None, 4) == 4
+    clock.now += 8
+    assert deadline.remaining() == 2
+    assert deadline.timeout(4) == 2
+    assert deadline.allows(2) and not deadline.allows(3)
+    child = deadline.within(5)
+    assert child.budget_sec == 2
+    clock.now += 3
+    assert deadline.expired() and deadline.timeout() == 0
+
+
+def test_live_sources_skip_page_fetches_when_time_is_short(monkeypatch):
+    clock = FakeClock()
+    fetched = []
+    results = [{"title": f"T{i}", "url": f"https://example.com/{i}", "snippet": f"snippet {i}"} for i in range(4)]
+
+    def fake_get(url, timeout=10, **kwargs):
+        fetched.append(url)
+        return web_content.HttpResponse(200, "<p>" + "useful words " * 40 + "</p>")
+
+    monkeypatch.setattr(web_content, "duckduckgo_search", lambda q, max_results=5, deadline=None: results)
+    monkeypatch.setattr(web_content, "http_get", fake_get)
+
+    # 5s left: the answer needs 4s, which leaves less than one fetch.
+    sources = web_content.gather_live_web_sources("q", max_sources=3, deadline=Deadline(5, clock=clock))
+    assert fetched == []
+    assert [s["content"] for s in sources] == ["Snippet source: snippet 0", "Snippet source: snippet 1", "Snippet source: snippet 2"]
+
+    answer, sources = web_content.live_web_answer("q", ask_llm_fn=lambda prompt: "unused", deadline=Deadline(0, clock=clock))
+    assert answer is None
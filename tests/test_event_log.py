@@ -0,0 +1,47 @@
+import threading
+
+from app.agent.event_log import SegmentedEventLog
+
+
+def _event(i):
+    return {"event_id": f"e{i}", "ts": f"2026-10-{1 + i // 10:02d}T00:00:{i % 60:02d}Z", "event_type": "interaction", "pad": "x" * 200}
+
+
+def test_segments_rotate_and_iterate_in_order(tmp_path):
+    log = SegmentedEventLog(tmp_path / "events.jsonl", max_segment_bytes=1024)
+    for i in range(30):
+        log.append(_event(i))
+
+    segments = log.segments()
+    assert len(segments) >= 2
+    assert sum(s["count"] for s in segments) < 30
+    assert [e["event_id"] for e in log.iter()] == [f"e{i}" for i in range(30)]
+    assert [e["event_id"] for e in log.iter(since="2026-10-03T00:00:00Z")] == [f"e{i}" for i in range(20, 30)]
+
+
+def test_tail_spans_sealed_segments(tmp_path):
+    log = SegmentedEventLog(tmp_path / "events.jsonl", max_segment_bytes=1024)
+    for i in range(12):
+        log.append(_event(i))
+    assert [e["event_id"] for e in log.tail(7)] == [f"e{i}" for i in range(5, 12)]
+    assert len(log.tail(100)) == 12
+
+
+def test_workers_sharing_a_log_rotate_without_losing_segments(tmp_path):
+    path = tmp_path / "events.jsonl"
+    logs = [SegmentedEventLog(path, max_segment_bytes=1024) for _ in range(2)]
+
+    def writer(log, offset):
+        for i in range(offset, 200, 2):
+            log.append(_event(i))
+
+    threads = [threading.Thread(target=writer, args=(log, offset)) for offset, log in enumerate(logs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    indexed = {s["file"] for s in logs[0].segments()}
+    assert indexed == {p.name for p in tmp_path.glob("events.0*.jsonl")}
+    assert sorted(e["event_id"] for e in logs[1].iter()) == sorted(f"e{i}" for i in range(200))
+    assert not list(tmp_path.glob("*.tmp"))
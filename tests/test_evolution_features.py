@@ -1,4 +1,7 @@
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from uuid import uuid4
 
 from fastapi.testclient import TestClient
 
@@ -61,25 +64,65 @@ def test_memory_items_crud(monkeypatch):
     assert dele.json().get("status") == "ok"
 
 
+def test_fact_apply_waits_for_the_memory_lock(monkeypatch):
+    monkeypatch.setattr(main, "memory_items_state", {"actors": {}})
+    monkeypatch.setattr(main, "save_memory_items", lambda: None)
+    monkeypatch.setattr(main, "_VECTOR_INDEX", None)
+    actor = f"fact-{uuid4().hex[:8]}"
+
+    with main._MEMORY_LOCK:
+        worker = threading.Thread(target=main._apply_extracted_facts, args=(("personal", actor, actor), [], ["Keeps bees"]))
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive()
+        assert main.get_memory_items_for_actor(actor) == []
+    worker.join(5)
+    assert [x["text"] for x in main.get_memory_items_for_actor(actor)] == ["Keeps bees"]
+    assert "Keeps bees" in main._PROFILE_STORE.get("personal", actor)["facts"]
+
+
 def test_history_semantic_search_function():
-    main.chat_history = [
-        {
-            "id": "abc123",
-            "requester": "tester",
-            "title": "Crypto Session",
-            "messages": [
-                {"ts": "2026-02-12T10:00:00Z", "label": "You", "content_text": "bitcoin momentum and market risk"},
-                {"ts": "2026-02-12T10:01:00Z", "label": "Lumiere", "content_text": "discussed risk management"},
-            ],
-            "created_at": "2026-02-12T10:00:00Z",
-            "updated_at": "2026-02-12T10:02:00Z",
-        }
-    ]
+    recent = datetime.now(timezone.utc) - timedelta(hours=1)
+    ts = recent.isoformat().replace("+00:00", "Z")
+    main.store_history_session(
+        "tester",
+        "abc123",
+        "Crypto Session",
+        [
+            {"ts": ts, "label": "You", "content_text": "bitcoin momentum and market risk"},
+            {"ts": ts, "label": "Lumiere", "content_text": "discussed risk management"},
+        ],
+        now=ts,
+    )
     hits = main.semantic_history_search("tester", "bitcoin market", limit=5)
     assert hits
     assert hits[0]["session_id"] == "abc123"
 
 
+def test_history_sessions_trimmed_by_cap_leave_the_index(monkeypatch):
+    monkeypatch.setattr(main._CHAT_STORE, "max_sessions_per_requester", 2)
+    actor = f"trim_{uuid4().hex[:8]}"
+    base = datetime.now(timezone.utc) - timedelta(hours=3)
+    topics = ["sourdough fermentation", "tidal energy", "violin practice"]
+    for i, topic in enumerate(topics):
+        ts = (base + timedelta(minutes=i)).isoformat().replace("+00:00", "Z")
+        main.store_history_session(actor, f"trim{i}", topic, [{"ts": ts, "label": "You", "content_text": f"notes on {topic}"}], now=ts)
+        # Search between saves so the actor's index is live when the cap trims.
+        assert main.semantic_history_search(actor, topic, limit=5)[0]["session_id"] == f"trim{i}"
+    assert main.semantic_history_search(actor, "sourdough fermentation", limit=5) == []
+    assert main.semantic_history_search(actor, "violin practice", limit=5)[0]["session_id"] == "trim2"
+
+
+def test_history_saved_by_another_worker_is_searchable():
+    actor = f"peer_{uuid4().hex[:8]}"
+    ts = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    main.store_history_session(actor, "own1", "Own", [{"ts": ts, "label": "You", "content_text": "sourdough fermentation"}], now=ts)
+    assert main.semantic_history_search(actor, "sourdough", limit=5)[0]["session_id"] == "own1"
+    # Another worker writes straight to the shared store; this worker's index never sees the save.
+    main._CHAT_STORE.save_session(actor, actor, "peer1", "Peer", [{"ts": ts, "label": "You", "content_text": "tidal energy"}], now=ts)
+    assert main.semantic_history_search(actor, "tidal energy", limit=5)[0]["session_id"] == "peer1"
+
+
 def test_checkpoint_create_and_regression(monkeypatch, tmp_path: Path):
     dataset_file = tmp_path / "lumiere_dataset_test.json"
     dataset_file.write_text('{"event_count": 10, "ratings": {"up": 3, "down": 1}}', encoding="utf-8")
@@ -98,3 +141,20 @@ def test_checkpoint_create_and_regression(monkeypatch, tmp_path: Path):
     body = reg.json()
     assert "passed" in body
     assert body.get("total", 0) >= 1
+
+
+def test_history_session_routes_use_store():
+    client = TestClient(main.app)
+    saved = client.post("/history/sessions", json={
+        "requester": "history_tester",
+        "title": "Route Session",
+        "messages": [{"label": "You", "content_text": "plan the week"}, {"label": "Lumiere", "content_text": "here is a plan"}],
+    })
+    sid = saved.json()["id"]
+    listed = client.get("/history/sessions", params={"requester": "history_tester"}).json()["sessions"]
+    assert listed[0]["id"] == sid and listed[0]["message_count"] == 2
+    detail = client.get(f"/history/sessions/{sid}", params={"requester": "history_tester"}).json()
+    assert [m["content_text"] for m in detail["messages"]] == ["plan the week", "here is a plan"]
+    assert client.get(f"/history/sessions/{sid}", params={"requester": "someone_else"}).json() == {"error": "Not found"}
+    assert client.delete(f"/history/sessions/{sid}", params={"requester": "history_tester"}).json() == {"status": "ok"}
+    assert client.get(f"/history/sessions/{sid}", params={"requester": "history_tester"}).json() == {"error": "Not found"}
@@ -0,0 +1,68 @@
+import threading
+
+from app.agent.fact_pipeline import FactPipeline, NormalizedTextIndex, normalized_text_hash
+
+
+def test_turns_are_batched_per_key_and_applied_off_thread():
+    calls, applied = [], []
+    threads = set()
+    done = threading.Event()
+
+    def extract(key, turns):
+        threads.add(threading.current_thread().name)
+        calls.append((key, list(turns)))
+        return [f"{key} fact {len(calls)}"]
+
+    def apply(key, turns, facts):
+        applied.extend(facts)
+        if len(applied) == 2:
+            done.set()
+
+    pipeline = FactPipeline(extract, apply, batch_size=3, linger_sec=0.05)
+    for i in range(3):
+        assert pipeline.submit("alice", (f"q{i}", f"a{i}"))
+    assert pipeline.submit("bob", ("q", "a"))
+
+    assert done.wait(5)
+    pipeline.close()
+    assert sorted((key, len(turns)) for key, turns in calls) == [("alice", 3), ("bob", 1)]
+    assert threads == {"lumiere-fact-pipeline"}
+    assert pipeline.stats()["batches"] == 2 and pipeline.stats()["pending"] == 0
+
+
+def test_queue_is_bounded_and_drain_processes_everything():
+    seen = []
+    pipeline = FactPipeline(lambda key, turns: seen.extend(turns) or [], lambda *a: None, batch_size=2, linger_sec=60, max_pending=3)
+    pipeline._ensure_worker = lambda: None  # keep the test on this thread
+    results = [pipeline.submit("k", i) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert pipeline.stats()["dropped"] == 2
+    assert pipeline.drain(timeout=5)
+    assert seen == [0, 1, 2]
+
+
+def test_extract_errors_are_counted_not_raised():
+    events = []
+
+    def extract(key, turns):
+        raise RuntimeError("provider down")
+
+    pipeline = FactPipeline(extract, lambda *a: None, logger=lambda event, **f: events.append(event))
+    pipeline._ensure_worker = lambda: None
+    pipeline.submit("k", 1)
+    assert pipeline.drain(timeout=5)
+    assert pipeline.stats()["errors"] == 1
+    assert events == ["fact_pipeline_batch_failed"]
+
+
+def test_normalized_text_index_tracks_appends_and_replacements():
+    assert normalized_text_hash("Likes  Tea.") == normalized_text_hash("likes tea")
+    index = NormalizedTextIndex()
+    rows = [{"text": "Likes tea"}]
+    assert index.contains("alice", rows, "likes TEA!")
+    rows.append({"text": "Works remotely"})
+    index.add("alice", rows, "Works remotely")
+    assert index.contains("alice", rows, "works remotely")
+    replaced = [{"text": "Lives in Accra"}]
+    assert not index.contains("alice", replaced, "likes tea")
+    assert index.contains("alice", replaced, "lives in accra")
@@ -0,0 +1,76 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from app.agent.history_index import HistoryIndex
+
+
+def _tokenize(value):
+    return [t for t in re.findall(r"[a-z0-9]+", str(value or "").lower()) if len(t) > 2]
+
+
+def _parse(value):
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+def _ts(days_ago):
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat()
+
+
+def test_bm25_ranking_incremental_updates_and_stale_filter():
+    stored = [
+        ("s1", "Crypto", {"ts": _ts(1), "label": "You", "content_text": "bitcoin market momentum today"}),
+        ("s1", "Crypto", {"ts": _ts(1), "label": "Lumiere", "content_text": "risk management notes"}),
+        ("s2", "Cooking", {"ts": _ts(90), "label": "You", "content_text": "bitcoin themed cake recipe"}),
+    ]
+    index = HistoryIndex(_tokenize, _parse)
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=45)).timestamp()
+
+    hits = index.search("alice", "bitcoin market", min_epoch=cutoff, loader=lambda: iter(stored))
+    assert [h["session_id"] for h in hits] == ["s1"]
+    assert len(index.search("alice", "bitcoin cake")) == 2
+
+    index.index_session("alice", "s3", "Stocks", [{"ts": _ts(0), "label": "You", "content_text": "market market outlook"}])
+    assert index.search("alice", "outlook")[0]["session_id"] == "s3"
+    index.remove_session("alice", "s3")
+    assert index.search("alice", "outlook") == []
+
+
+def test_large_actor_search_ranks_the_exact_match_first():
+    stored = [
+        (f"s{i // 20}", "Session", {"ts": _ts(i % 30), "label": "You", "content_text": f"topic{i % 97} note{i} planning review"})
+        for i in range(5000)
+    ]
+    index = HistoryIndex(_tokenize, _parse)
+    index.search("bob", "warmup", loader=lambda: iter(stored))
+    hits = index.search("bob", "topic42 note4213")
+    assert hits[0]["content_text"] == "topic42 note4213 planning review"
+    assert all("topic42" in h["content_text"] for h in hits)
+
+
+def test_sessions_saved_by_another_worker_trigger_a_rebuild():
+    stored = [("s1", "Crypto", {"ts": _ts(1), "label": "You", "content_text": "bitcoin market momentum"})]
+    store = {"version": 1}
+    loads = []
+
+    def loader():
+        loads.append(store["version"])
+        return iter(list(stored))
+
+    worker_a, worker_b = HistoryIndex(_tokenize, _parse), HistoryIndex(_tokenize, _parse)
+    for worker in (worker_a, worker_b):
+        assert worker.search("carol", "bitcoin", loader=loader, version=store["version"])
+
+    # Worker B saves a session; its own index moves to the new version in place.
+    stored.append(("s2", "Garden", {"ts": _ts(0), "label": "You", "content_text": "tomato seedlings"}))
+    store["version"] = 2
+    worker_b.index_session("carol", "s2", "Garden", [stored[-1][2]], versions=(1, 2))
+    assert worker_b.search("carol", "tomato", loader=loader, version=2)[0]["session_id"] == "s2"
+    assert loads == [1, 1]
+
+    # Worker A never saw the save; the new version makes it reload.
+    assert worker_a.search("carol", "tomato", loader=loader, version=2)[0]["session_id"] == "s2"
+    assert loads == [1, 1, 2]
+    assert worker_a.search("carol", "bitcoin", loader=loader, version=2) and loads == [1, 1, 2]
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+from app.agent.llm_cache import LLMResponseCache, cache_key, parse_site_ttls
+
+
+def test_key_normalizes_whitespace_and_separates_model_and_temperature():
+    assert cache_key("m", "Hello   world\n") == cache_key("m", " Hello world")
+    assert cache_key("m", "hello world") != cache_key("m", "Hello world")
+    assert cache_key("m", "x", 0.1) != cache_key("m", "x", 0.7)
+    assert cache_key("a", "x") != cache_key("b", "x")
+    messages = [{"role": "user", "content": "hi  there"}]
+    assert cache_key("m", messages) == cache_key("m", [{"role": "user", "content": "hi there"}])
+    assert parse_site_ttls("adjudicate=0, milestones=60,bad") == {"adjudicate": 0.0, "milestones": 60.0}
+
+
+def test_opt_in_sites_failures_lru_and_ttl():
+    cache = LLMResponseCache(max_entries=2, site_ttls={"facts": 60, "chat": 0}, is_failure=lambda t: t.startswith("Model error"))
+    calls = []
+
+    def compute(value):
+        def run():
+            calls.append(value)
+            return value
+        return run
+
+    assert cache.call("facts", "m", "p1", 0.1, compute("a")) == "a"
+    assert cache.call("facts", "m", "p1 ", 0.1, compute("b")) == "a"
+    assert cache.call("chat", "m", "p1", 0.1, compute("c")) == "c"
+    assert cache.call("chat", "m", "p1", 0.1, compute("d")) == "d"
+    assert cache.call("facts", "m", "bad", 0.1, compute("Model error: x")) == "Model error: x"
+    assert cache.call("facts", "m", "bad", 0.1, compute("ok")) == "ok"
+    assert calls == ["a", "c", "d", "Model error: x", "ok"]
+
+    cache.call("facts", "m", "p2", 0.1, compute("p2"))
+    assert cache.get("facts", cache_key("m", "p1", 0.1)) is None  # evicted by LRU
+
+    cache.put("facts", "k", "short-lived", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("facts", "k") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["skipped_failures"] == 1
+    assert stats["sites"]["facts"]["hits"] == 1
+    assert 0 < stats["hit_rate"] < 1
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    first = LLMResponseCache(site_ttls={"judge": 60}, disk_path=path)
+
+    async def compute():
+        return "verdict"
+
+    assert asyncio.run(first.call_async("judge", "m", "prompt", 0.75, compute)) == "verdict"
+
+    second = LLMResponseCache(site_ttls={"judge": 60}, disk_path=path)
+
+    async def fail():
+        raise AssertionError("should be served from disk")
+
+    assert asyncio.run(second.call_async("judge", "m", "prompt", 0.75, fail)) == "verdict"
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_async_calls_keep_disk_io_off_the_event_loop(tmp_path):
+    cache = LLMResponseCache(site_ttls={"judge": 60}, disk_path=str(tmp_path / "llm_cache.sqlite"))
+    disk_threads = []
+    original_disk = cache._disk
+    cache._disk = lambda: disk_threads.append(threading.get_ident()) or original_disk()
+
+    async def compute():
+        return "verdict"
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await cache.call_async("judge", "m", "prompt", 0.0, compute)
+        calls = len(disk_threads)
+        second = await cache.call_async("judge", "m", "prompt", 0.0, compute)
+        return loop_thread, first, second, calls
+
+    loop_thread, first, second, calls = asyncio.run(run())
+    assert first == second == "verdict"
+    # Lookup and store went to disk from worker threads; the memory hit never touched it.
+    assert calls == 2 and len(disk_threads) == 2
+    assert loop_thread not in disk_threads
+    assert cache.stats()["memory_hits"] == 1
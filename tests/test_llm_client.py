@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.agent.llm_client import ProviderHTTPError, ProviderPool
+
+
+def _pool(handler):
+    return ProviderPool({"groq": "https://groq.test", "ollama": "http://ollama.test"}, transport=httpx.MockTransport(handler))
+
+
+def test_pool_post_json_and_http_error():
+    def handler(request):
+        if request.url.path == "/fail":
+            return httpx.Response(429, text="slow down", headers={"Retry-After": "3"})
+        return httpx.Response(200, json={"path": request.url.path, "host": request.url.host})
+
+    pool = _pool(handler)
+    try:
+        data = pool.run_sync(pool.post_json("ollama", "/api/generate", {"x": 1}))
+        assert data == {"path": "/api/generate", "host": "ollama.test"}
+        with pytest.raises(ProviderHTTPError) as exc:
+            pool.run_sync(pool.get_json("groq", "/fail"))
+        assert exc.value.code == 429
+        assert exc.value.headers.get("retry-after") == "3"
+    finally:
+        pool.close()
+
+
+def test_pool_request_is_cancelled_with_awaiting_task():
+    cancelled = []
+
+    async def handler(request):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(request.url.path)
+            raise
+        return httpx.Response(200, json={})
+
+    pool = _pool(handler)
+
+    async def caller():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.post_json("groq", "/slow", {}), timeout=0.2)
+        await asyncio.sleep(0.2)
+
+    try:
+        asyncio.run(caller())
+        assert cancelled == ["/slow"]
+    finally:
+        pool.close()
+
+
+def test_ask_llm_routes_ollama_through_pool(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "llama3.2:latest"}]})
+        return httpx.Response(200, json={"response": "pooled hello"})
+
+    pool = _pool(handler)
+    monkeypatch.setattr(main, "_LLM_POOL", pool)
+    try:
+        assert main.ask_llm("hi", model_key_override="ollama-llama32-latest") == "pooled hello"
+        assert asyncio.run(main.ask_llm_with_model_async("hi", "ollama-llama32-latest")) == "pooled hello"
+        assert "/api/generate" in seen
+    finally:
+        pool.close()
+
+
+def test_pool_stream_lines_yields_ndjson_lines():
+    def handler(request):
+        return httpx.Response(200, content=b'{"response":"a"}\n\n{"response":"b","done":true}\n')
+
+    pool = _pool(handler)
+
+    async def collect():
+        return [line async for line in pool.stream_lines("ollama", "/api/generate", {})]
+
+    try:
+        assert asyncio.run(collect()) == ['{"response":"a"}', '{"response":"b","done":true}']
+    finally:
+        pool.close()
+
+
+def test_ask_stream_sends_tokens_then_final_html(monkeypatch):
+    def handler(request):
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "llama3.2:latest"}]})
+        body = b'{"response":"Stars are "}\n{"response":"hot plasma."}\n{"response":"","done":true}\n'
+        return httpx.Response(200, content=body)
+
+    pool = _pool(handler)
+    monkeypatch.setattr(main, "_LLM_POOL", pool)
+    monkeypatch.setattr(main, "resolve_model_key_for_specialty", lambda specialty, model: "ollama-llama32-latest")
+    monkeypatch.setattr(main, "save_agents", lambda: None)
+    monkeypatch.setattr(main, "save_chain_state", lambda: None)
+    monkeypatch.setattr(main, "save_usage_log", lambda: None)
+    monkeypatch.setattr(main, "save_global_core", lambda: None)
+    monkeypatch.setattr(main, "strict_access_block", lambda specialty, requester_name: None)
+    monkeypatch.setattr(main, "rental_lock_for_requester", lambda specialty, requester_name: None)
+    try:
+        client = TestClient(main.app)
+        resp = client.get("/ask", params={"q": "What are stars made of?", "requester": "tester", "stream": "true"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = [block for block in resp.text.split("\n\n") if block.strip()]
+        assert events[0] == 'event: token\ndata: {"text": "Stars are "}'
+        assert events[-1].startswith("event: done\n")
+        assert "thumbs-rating" in events[-1]
+    finally:
+        pool.close()
@@ -0,0 +1,61 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from app.agent.model_registry import ModelRegistry
+
+
+def test_registry_serves_snapshot_without_probing_on_reads():
+    calls = []
+    state = {"fail": False}
+
+    def probe():
+        calls.append(1)
+        if state["fail"]:
+            raise ConnectionError("refused")
+        return ["llama3.2:latest", " ", "qwen2.5:14b"]
+
+    registry = ModelRegistry({"ollama": probe}, refresh_interval_sec=3600)
+    registry._ensure_refresher = lambda: None
+    assert registry.models("ollama") == []
+    assert registry.reachable("ollama") is None
+    assert calls == []
+
+    registry.refresh()
+    for _ in range(5):
+        assert registry.models("ollama") == ["llama3.2:latest", "qwen2.5:14b"]
+    assert len(calls) == 1
+    assert registry.snapshot()["ollama"]["reachable"] is True
+
+    state["fail"] = True
+    registry.refresh("ollama")
+    snap = registry.snapshot()["ollama"]
+    assert snap["reachable"] is False and "refused" in snap["error"]
+    assert registry.models("ollama") == ["llama3.2:latest", "qwen2.5:14b"]
+
+
+def test_background_refresh_runs_on_invalidate():
+    seen = threading.Event()
+    registry = ModelRegistry({"ollama": lambda: seen.set() or ["mistral:latest"]}, refresh_interval_sec=3600)
+    try:
+        registry.invalidate()
+        assert seen.wait(2)
+    finally:
+        registry.close()
+
+
+def test_fallback_chain_and_health_use_registry(monkeypatch):
+    registry = ModelRegistry({"ollama": lambda: ["llama3.2:latest"]}, refresh_interval_sec=3600)
+    registry._ensure_refresher = lambda: None
+    registry.refresh()
+    monkeypatch.setattr(main, "_MODEL_REGISTRY", registry)
+
+    keys = main._fallback_model_keys("groq-llama3.3")
+    assert "ollama-llama32-latest" in keys
+    assert "ollama-qwen25-14b" not in keys
+
+    body = TestClient(main.app).get("/health/deep").json()
+    assert body["providers"]["ollama"]["models"] == ["llama3.2:latest"]
+    assert body["models"]["ollama-llama32-latest"] is True
+    assert "running" in body["scheduler"]
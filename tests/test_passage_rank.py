@@ -0,0 +1,34 @@
+from app.agent.passage_rank import bm25_scores, passage_tokens, select_passages, split_passages
+
+
+def test_split_passages_cover_text_on_sentence_boundaries():
+    text = " ".join(f"Sentence number {i} talks about topic {i}." for i in range(40))
+    spans = split_passages(text, target_chars=200)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+    assert all(text[s:e].rstrip().endswith(".") for s, e in spans)
+    assert all(len(text[s:e]) < 400 for s, e in spans)
+
+    long_run = "word " * 300
+    spans = split_passages(long_run, target_chars=200)
+    assert len(spans) > 3 and all(e - s <= 400 for s, e in spans)
+
+
+def test_bm25_prefers_rare_matching_terms():
+    docs = [passage_tokens(t) for t in ("pricing pricing strategy", "the market is big", "pricing for saas startups in ghana")]
+    scores = bm25_scores(passage_tokens("saas pricing in Ghana"), docs)
+    assert scores[2] > scores[0] > scores[1] == 0.0
+
+
+def test_select_passages_ranks_per_source_under_a_budget():
+    filler = " ".join(f"Unrelated filler sentence {i} about weather." for i in range(30))
+    page_a = filler + " Mobile money fees in Ghana are capped at one percent. " + filler
+    page_b = "Nothing here matches the question at all. " * 20
+    picks = select_passages("mobile money fees Ghana", [page_a, page_b], per_source=2, total_chars=900, target_chars=300)
+
+    best = picks[0][0] if picks[0][0]["score"] else picks[0][1]
+    assert "Mobile money fees" in page_a[best["start"]:best["end"]]
+    # A page with no matching terms still contributes its opening passage.
+    assert picks[1][0]["start"] == 0 and picks[1][0]["score"] == 0.0
+    assert sum(p["end"] - p["start"] for row in picks for p in row) <= 900
+    assert all(row == sorted(row, key=lambda p: p["start"]) for row in picks)
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine
+
+from app.agent.profile_store import AgentProfileStore
+
+
+def test_rows_are_lazy_lru_cached_and_written_individually(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiles.db'}")
+    store = AgentProfileStore(engine, max_cached=2)
+
+    profile = store.get("coding", "alice")
+    assert profile == {"raw_history": [], "facts": []}
+    assert store.count() == 0
+
+    profile["raw_history"].append({"role": "user", "content": "hello"})
+    profile["facts"].append("likes rust")
+    store.save("coding", "alice", profile)
+    store.save("coding", "bob", {"raw_history": [], "facts": ["prefers go"]})
+    store.get("personal", "alice")
+    assert ("coding", "alice") not in store._cache
+
+    fresh = AgentProfileStore(engine)
+    assert fresh.get("coding", "alice")["facts"] == ["likes rust"]
+    assert fresh.get("coding", "bob")["facts"] == ["prefers go"]
+    assert fresh.count() == 2
+
+
+def test_import_rename_and_clear(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiles.db'}")
+    store = AgentProfileStore(engine)
+    store.save("personal", "alice", {"raw_history": [{"role": "user", "content": "new"}], "facts": []})
+
+    legacy = {
+        "alice": {"raw_history": [{"role": "user", "content": "old"}], "facts": ["old fact"]},
+        "bob": {"raw_history": [{"role": "user", "content": "hi"}], "facts": ["bob fact"]},
+    }
+    assert store.import_profiles("general", legacy) == 2
+    assert store.import_profiles("general", legacy) == 0
+
+    assert store.rename_specialty("general", "personal") == 1
+    assert store.get("personal", "alice")["raw_history"][0]["content"] == "new"
+    assert store.get("personal", "bob")["facts"] == ["bob fact"]
+    assert store.get("general", "bob") == {"raw_history": [], "facts": []}
+
+    assert store.clear_actor("bob", history_only=True) == 1
+    assert store.get("personal", "bob") == {"raw_history": [], "facts": ["bob fact"]}
+    assert store.clear_actor("bob") == 1
+    assert AgentProfileStore(engine).get("personal", "bob") == {"raw_history": [], "facts": []}
@@ -0,0 +1,35 @@
+from app.agent.prompt_budget import PromptSection, estimate_tokens, fit_prompt
+
+
+def test_estimate_tokens_tracks_text_size():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello world") == 2
+    assert estimate_tokens("internationalization") == 4
+    assert estimate_tokens("2026-10-16") == 6
+    assert estimate_tokens("word " * 400) == 400
+
+
+def test_fit_prompt_keeps_everything_under_budget_in_original_order():
+    sections = [PromptSection("a", "alpha", priority=1), PromptSection("b", "beta", priority=9)]
+    texts, report = fit_prompt("Answer: hi", sections, budget_tokens=1000)
+    assert texts == {"a": "alpha", "b": "beta"}
+    assert report["trimmed"] == [] and report["dropped"] == []
+    assert report["prompt_tokens"] == estimate_tokens("Answer: hi") + 4
+
+
+def test_fit_prompt_trims_then_drops_low_priority_sections():
+    turns = "\n".join(f"turn {i} " + "word " * 20 for i in range(20))
+    sections = [
+        PromptSection("core", "core fact " * 200, priority=10),
+        PromptSection("turns", turns, priority=90, keep="tail"),
+        PromptSection("memory", "memory " * 100, priority=50, min_tokens=64),
+    ]
+    texts, report = fit_prompt("Question?", sections, budget_tokens=300)
+
+    assert texts["turns"].splitlines()[-1].startswith("turn 19 ")
+    assert "turn 0 " not in texts["turns"]
+    assert texts["memory"] == ""
+    assert texts["core"].startswith("core fact")
+    assert report["trimmed"] == ["turns", "core"]
+    assert report["dropped"] == ["memory"]
+    assert report["prompt_tokens"] <= 300
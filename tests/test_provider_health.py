@@ -0,0 +1,181 @@
+import asyncio
+
+import main
+from app.agent.provider_health import HedgeBudget, LatencyTracker, ProviderHealth, parse_route_ratios
+
+
+def test_latency_percentiles_and_hedge_budget():
+    tracker = LatencyTracker(window=10, min_samples=3)
+    tracker.record("m", 1.0)
+    assert tracker.percentile("m", 0.9) is None
+    for value in (2.0, 3.0, 4.0, 5.0):
+        tracker.record("m", value)
+    assert tracker.percentile("m", 0.5) == 3.0
+    assert tracker.percentile("m", 0.9) == 5.0
+
+    budget = HedgeBudget(ratio=0.5, burst=1.0)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_spend()
+    assert not HedgeBudget(ratio=0.0).try_spend()
+    assert parse_route_ratios("ask=0.3, debate=0,bad,x=y") == {"ask": 0.3, "debate": 0.0}
+
+
+def _fake_models(monkeypatch, delays, answers):
+    calls, cancelled = [], []
+
+    async def fake_call(question, key, timeout_sec):
+        calls.append(key)
+        try:
+            await asyncio.sleep(delays[key])
+        except asyncio.CancelledError:
+            cancelled.append(key)
+            raise
+        return answers[key]
+
+    monkeypatch.setattr(main, "_run_model_call_with_timeout_async", fake_call)
+    monkeypatch.setattr(main, "_fallback_model_keys", lambda primary: ["fb-1", "fb-2"])
+    monkeypatch.setattr(main, "LLM_HEDGE_DEFAULT_DELAY_SEC", 0.05)
+    monkeypatch.setattr(main, "LLM_HEDGE_MIN_DELAY_SEC", 0.05)
+    monkeypatch.setattr(main, "_HEDGE_BUDGETS", {})
+    return calls, cancelled
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled(monkeypatch):
+    calls, cancelled = _fake_models(
+        monkeypatch,
+        {"groq-llama3.3": 1.0, "fb-1": 0.01, "fb-2": 0.01},
+        {"groq-llama3.3": "primary", "fb-1": "hedged answer", "fb-2": "unused"},
+    )
+    monkeypatch.setattr(main, "LLM_HEDGE_BUDGETS", {"default": 0.0, "ask": 1.0})
+
+    out = asyncio.run(main.ask_llm_with_model_async("q", "groq-llama3.3", route="ask"))
+    assert out == "[Auto-fallback: fb-1]\n\nhedged answer"
+    assert calls == ["groq-llama3.3", "fb-1"]
+    assert cancelled == ["groq-llama3.3"]
+
+
+def test_no_budget_waits_for_primary_then_falls_back_on_failure(monkeypatch):
+    calls, _ = _fake_models(
+        monkeypatch,
+        {"groq-llama3.3": 0.1, "fb-1": 0.01, "fb-2": 0.01},
+        {"groq-llama3.3": "Model timeout: generation took too long.", "fb-1": "Groq error: HTTP 500", "fb-2": "second fallback"},
+    )
+    monkeypatch.setattr(main, "LLM_HEDGE_BUDGETS", {"default": 0.0})
+
+    out = asyncio.run(main.ask_llm_with_model_async("q", "groq-llama3.3", route="translate"))
+    assert out == "[Auto-fallback: fb-2]\n\nsecond fallback"
+    assert calls == ["groq-llama3.3", "fb-1", "fb-2"]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_derives_timeouts():
+    clock = _Clock()
+    health = ProviderHealth(latency=LatencyTracker(min_samples=3), failure_threshold=2, cooldown_sec=10, timeout_floor_sec=2, clock=clock)
+    health.record_failure("m", error="timeout")
+    assert health.acquire("m") == (True, 0)
+    health.record_failure("m", error="timeout")
+    assert health.acquire("m") == (False, 10)
+    assert not health.available("m")
+
+    clock.now += 10
+    assert health.acquire("m") == (True, 0)  # half-open probe
+    assert not health.available("m")
+    health.record_failure("m")
+    assert health.snapshot()["m"]["state"] == "open"
+    assert health.acquire("m")[1] == 20  # cooldown doubles
+
+    clock.now += 20
+    assert health.acquire("m")[0]
+    health.record_success("m", 1.0)
+    assert health.snapshot()["m"]["state"] == "closed"
+
+    health.trip("m", retry_after=7, error="HTTP 429")
+    assert health.acquire("m") == (False, 7)
+
+    assert health.timeout_for("fast", 40) == 40
+    for value in (0.5, 0.6, 0.7):
+        health.record_success("fast", value)
+    assert health.timeout_for("fast", 40) == 2  # floor
+    for value in (9.0, 9.0, 9.0):
+        health.record_success("fast", value)
+    assert health.timeout_for("fast", 40) == 18.0
+    assert health.timeout_for("fast", 12) == 12
+
+
+def test_groq_429_opens_breaker_with_retry_after(monkeypatch):
+    import httpx
+
+    from app.agent.llm_client import ProviderPool
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(429, text="slow down", headers={"Retry-After": "120"})
+
+    pool = ProviderPool({"groq": "https://groq.test", "ollama": "http://ollama.test"}, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "_LLM_POOL", pool)
+    monkeypatch.setattr(main, "_PROVIDER_HEALTH", ProviderHealth())
+    monkeypatch.setattr(main, "_best_available_ollama_model_name", lambda: None)
+    monkeypatch.setitem(main.MODELS["groq-llama3.3"], "api_key", "test-key")
+    try:
+        first = main.ask_llm("hi", model_key_override="groq-llama3.3")
+        assert first.startswith("Groq error: HTTP 429")
+        second = main.ask_llm("hi", model_key_override="groq-llama3.3")
+        assert "circuit open" in second and main._is_llm_failure_text(second)
+        assert calls == ["/chat/completions"]
+        assert main._PROVIDER_HEALTH.snapshot()["groq-llama3.3"]["retry_in_sec"] == 120
+    finally:
+        pool.close()
+
+
+def _collect_stream(question, model_key):
+    async def run():
+        return [token async for token in main.stream_llm_with_model(question, model_key)]
+
+    return asyncio.run(run())
+
+
+def test_streaming_feeds_and_respects_the_breaker(monkeypatch):
+    import httpx
+
+    from app.agent.llm_client import ProviderPool
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == "/chat/completions":
+            return httpx.Response(429, text="slow down", headers={"Retry-After": "120"})
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "llama3.2:latest"}]})
+        body = b'{"response":"Local "}\n{"response":"answer."}\n{"response":"","done":true}\n'
+        return httpx.Response(200, content=body)
+
+    pool = ProviderPool({"groq": "https://groq.test", "ollama": "http://ollama.test"}, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "_LLM_POOL", pool)
+    monkeypatch.setattr(main, "_PROVIDER_HEALTH", ProviderHealth(latency=LatencyTracker(min_samples=1)))
+    monkeypatch.setattr(main, "_best_available_ollama_model_name", lambda: None)
+    monkeypatch.setitem(main.MODELS["groq-llama3.3"], "api_key", "test-key")
+    try:
+        _collect_stream("hi", "groq-llama3.3")
+        assert main._PROVIDER_HEALTH.snapshot()["groq-llama3.3"]["retry_in_sec"] == 120
+        groq_calls = calls.count("/chat/completions")
+        # Breaker open: the next stream does not reach Groq at all.
+        _collect_stream("hi again", "groq-llama3.3")
+        assert calls.count("/chat/completions") == groq_calls
+
+        assert "".join(_collect_stream("hello", "ollama-llama32-latest")) == "Local answer."
+        assert main._PROVIDER_HEALTH.latency.percentile("ollama-llama32-latest", 0.5) is not None
+    finally:
+        pool.close()
@@ -53,3 +53,74 @@ def test_coding_ask_repairs_to_code_block(monkeypatch):
 def test_personalize_fact_uses_actor_name():
     out = personalize_fact_for_actor("User wants to add more features to banking system", "Emmanuel")
     assert out.startswith("Emmanuel wants to")
+
+
+def test_stable_prompt_layout_keeps_clock_out_of_the_prefix(monkeypatch):
+    from datetime import datetime, timezone
+
+    assert main.lumiere_system_prompt(include_clock=False) == main.lumiere_system_prompt(include_clock=False)
+    assert "Current UTC datetime" not in main.lumiere_system_prompt(include_clock=False)
+    assert "Current UTC datetime" in main.lumiere_system_prompt(include_clock=True)
+    block = main.time_grounding_block(datetime(2026, 10, 16, 9, 47, 12, 345, tzinfo=timezone.utc))
+    assert "UTC 2026-10-16T09:00:00+00:00" in block
+
+    monkeypatch.setattr(main, "STABLE_PROMPT_LAYOUT", True)
+    grounded = main.with_time_grounding("hello")
+    assert grounded.startswith("hello\n\n") and main.TIME_GROUNDING_PREFIX in grounded
+    assert main.with_time_grounding(grounded) == grounded
+    monkeypatch.setattr(main, "STABLE_PROMPT_LAYOUT", False)
+    assert main.with_time_grounding("hello") == "hello"
+
+
+def test_provider_calls_do_not_append_the_clock(monkeypatch):
+    import httpx
+
+    from app.agent.llm_client import ProviderPool
+    from app.agent.provider_health import ProviderHealth
+
+    sent = []
+
+    def handler(request):
+        sent.append(request.content.decode("utf-8"))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "Bonjour"}}]})
+
+    pool = ProviderPool({"groq": "https://groq.test", "ollama": "http://ollama.test"}, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "STABLE_PROMPT_LAYOUT", True)
+    monkeypatch.setattr(main, "_LLM_POOL", pool)
+    monkeypatch.setattr(main, "_PROVIDER_HEALTH", ProviderHealth())
+    monkeypatch.setitem(main.MODELS["groq-llama3.3"], "api_key", "test-key")
+    try:
+        assert main.ask_llm("Translate to French. Return only the translated text.\nText: hello", model_key_override="groq-llama3.3") == "Bonjour"
+    finally:
+        pool.close()
+    assert sent and main.TIME_GROUNDING_PREFIX not in sent[0]
+
+
+def test_debate_generates_both_perspectives_concurrently(monkeypatch):
+    import asyncio
+
+    active = {"now": 0, "peak": 0}
+
+    async def fake_generate(prompt, model_key, route="default", deadline=None):
+        assert deadline is not None
+        assert main.TIME_GROUNDING_PREFIX in prompt
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        if "Perspective B." in prompt:
+            return "Model error: provider down"
+        return "Perspective text." if "Perspective A." in prompt else "Balanced synthesis."
+
+    for name in ("save_agents", "save_global_core", "save_usage_log", "save_chain_state"):
+        monkeypatch.setattr(main, name, lambda: None)
+    monkeypatch.setattr(main, "strict_access_block", lambda specialty, requester_name: None)
+    monkeypatch.setattr(main, "rental_lock_for_requester", lambda specialty, requester_name: None)
+    monkeypatch.setattr(main, "generate_with_model", fake_generate)
+    monkeypatch.setattr(main, "STABLE_PROMPT_LAYOUT", True)
+
+    client = TestClient(main.app)
+    resp = client.get("/debate", params={"q": "Should I learn Rust?", "requester": "tester"})
+    assert resp.status_code == 200
+    assert active["peak"] == 2
+    assert "Balanced synthesis." in resp.text
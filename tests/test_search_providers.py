@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from app.agent import web_content
+from app.agent.search_providers import FallbackSearchProvider, LocalCorpusProvider, SearchProvider, build_search_provider, fts_match_query
+
+
+class StaticProvider(SearchProvider):
+    def __init__(self, name, results):
+        self.name = name
+        self.results = results
+        self.calls = 0
+
+    def search(self, query, max_results=5, deadline=None):
+        self.calls += 1
+        return self.results[:max_results]
+
+
+def _corpus():
+    corpus = LocalCorpusProvider()
+    corpus.add_document("a", "Pricing your SaaS", "Start with value-based pricing and test three tiers with early customers.")
+    corpus.add_document("b", "Hiring engineers", "Hire slowly. Pricing is not covered here, but equity is.")
+    corpus.add_document("c", "Grant programs", "Grants in Ghana fund early founders without taking equity.", url="https://grants.example")
+    return corpus
+
+
+def test_local_corpus_ranks_with_fts5_and_returns_content():
+    assert fts_match_query("How should I price my SaaS?") == '"price" OR "saas"'
+    results = _corpus().search("How should I price my SaaS?")
+    assert [r["title"] for r in results][0] == "Pricing your SaaS"
+    assert results[0]["url"] == "local://corpus/a" and "three tiers" in results[0]["content"]
+    assert _corpus().search("grants for founders in Ghana")[0]["url"] == "https://grants.example"
+    assert _corpus().search("the of and") == []
+
+
+def test_documents_are_replaced_by_id_and_loaded_lazily():
+    loads = []
+    corpus = LocalCorpusProvider(loader=lambda c: loads.append(c.add_document("x", "Old", "old pricing text")))
+    assert loads == []
+    assert corpus.count() == 1 and loads == [True]
+    corpus.add_document("x", "New", "new pricing text")
+    assert [r["title"] for r in corpus.search("pricing")] == ["New"]
+    corpus.remove_document("x")
+    assert corpus.search("pricing") == [] and corpus.stats()["documents"] == 0
+
+
+def test_loader_failures_retry_and_readers_wait_for_the_full_load():
+    attempts, release = [], threading.Event()
+
+    def loader(corpus):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("corpus dir unavailable")
+        corpus.add_document("a", "Pricing", "first pricing doc")
+        release.wait(5)
+        corpus.add_document("b", "Pricing again", "second pricing doc")
+
+    corpus = LocalCorpusProvider(loader=loader)
+    with pytest.raises(OSError):
+        corpus.search("pricing")
+    assert corpus.stats()["loaded"] is False
+
+    loading = threading.Thread(target=corpus.count)
+    loading.start()
+    while len(attempts) < 2:
+        time.sleep(0.01)
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(len(corpus.search("pricing"))))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive()
+    release.set()
+    loading.join(5)
+    reader.join(5)
+    assert seen == [2] and len(attempts) == 2
+
+
+def test_search_provider_requires_search():
+    with pytest.raises(TypeError):
+        SearchProvider()
+
+
+def test_fallback_chain_and_spec_resolution():
+    empty, web = StaticProvider("local", []), StaticProvider("duckduckgo", [{"title": "T", "url": "u", "snippet": "s"}])
+    chain = build_search_provider("local, duckduckgo", {"local": empty, "duckduckgo": web})
+    assert isinstance(chain, FallbackSearchProvider) and chain.name == "local,duckduckgo"
+    assert chain.search("q")[0]["url"] == "u" and empty.calls == 1
+    assert build_search_provider("bogus", {"local": empty, "duckduckgo": web}) is web
+
+
+def test_live_answer_runs_offline_on_the_local_corpus(monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("local sources must not be fetched")
+
+    monkeypatch.setattr(web_content, "http_get", no_network)
+    monkeypatch.setattr(web_content, "_SEARCH_PROVIDER", _corpus())
+    prompts = []
+    answer, sources = web_content.live_web_answer("SaaS pricing tiers", ask_llm_fn=lambda p: prompts.append(p) or "Use three tiers [1].")
+    assert answer == "Use three tiers [1]."
+    assert sources[0]["title"] == "Pricing your SaaS" and sources[0]["passages"]
+    assert "value-based pricing" in prompts[0]
+
+
+def test_runtime_corpus_indexes_opportunities():
+    from app.agent import runtime
+
+    results = runtime._LOCAL_CORPUS.search("accelerator for fintech founders in Ghana", max_results=3)
+    assert results and results[0]["url"].startswith("http")
+    assert runtime.search_provider().name == "duckduckgo"
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+import main
+from app.agent.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution_and_errors():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        if value == "boom":
+            raise ValueError("boom")
+        return value
+
+    async def main_():
+        results = await asyncio.gather(*[flight.do("k", lambda: work("x")) for _ in range(5)])
+        errors = await asyncio.gather(*[flight.do("e", lambda: work("boom")) for _ in range(3)], return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main_())
+    assert results == ["x"] * 5
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert calls == ["x", "boom"]
+    assert flight.stats() == {"leaders": 2, "collapsed": 6, "inflight": 0}
+
+
+def test_follower_on_another_loop_and_leader_cancellation():
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    async def slow():
+        calls.append("run")
+        started.set()
+        await asyncio.sleep(0.2)
+        return "done"
+
+    follower_result = {}
+
+    def follower():
+        started.wait(2)
+        follower_result["value"] = asyncio.run(flight.do("k", slow))
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+
+    async def leader():
+        task = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(leader())
+    thread.join(5)
+    assert follower_result["value"] == "done"
+    assert calls == ["run", "run"]
+
+
+def test_identical_model_calls_are_coalesced(monkeypatch):
+    calls = []
+
+    async def fake_call(question, key, timeout_sec):
+        calls.append((question, key))
+        await asyncio.sleep(0.05)
+        return f"answer to {question}"
+
+    monkeypatch.setattr(main, "_run_model_call_with_timeout_async", fake_call)
+    monkeypatch.setattr(main, "_fallback_model_keys", lambda primary: [])
+    monkeypatch.setattr(main, "_LLM_SINGLEFLIGHT", SingleFlight())
+
+    async def burst():
+        return await asyncio.gather(
+            *[main.ask_llm_with_model_async("same prompt", "groq-llama3.3") for _ in range(4)],
+            main.ask_llm_with_model_async("other prompt", "groq-llama3.3"),
+        )
+
+    out = asyncio.run(burst())
+    assert out[:4] == ["answer to same prompt"] * 4
+    assert out[4] == "answer to other prompt"
+    assert len(calls) == 2
+    assert main._LLM_SINGLEFLIGHT.stats()["collapsed"] == 3
+
+    async def two_routes():
+        return await asyncio.gather(
+            main.ask_llm_with_model_async("same prompt", "groq-llama3.3", route="ask"),
+            main.ask_llm_with_model_async("same prompt", "groq-llama3.3", route="debate"),
+        )
+
+    assert asyncio.run(two_routes()) == ["answer to same prompt"] * 2
+    assert len(calls) == 4
+
+
+def test_shared_call_is_not_capped_by_the_leaders_deadline(monkeypatch):
+    timeouts = []
+
+    async def fake_call(question, key, timeout_sec):
+        timeouts.append(timeout_sec)
+        try:
+            await asyncio.wait_for(asyncio.sleep(0.3), timeout=timeout_sec)
+        except asyncio.TimeoutError:
+            return "Model timeout: provider call timed out."
+        return f"answer to {question}"
+
+    monkeypatch.setattr(main, "_run_model_call_with_timeout_async", fake_call)
+    monkeypatch.setattr(main, "_fallback_model_keys", lambda primary: [])
+    monkeypatch.setattr(main, "_LLM_SINGLEFLIGHT", SingleFlight())
+    monkeypatch.setattr(main, "LLM_MIN_ATTEMPT_SEC", 0.01)
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        return await main.ask_llm_with_model_async("same prompt", "groq-llama3.3", deadline=main.Deadline(5.0))
+
+    async def both():
+        return await asyncio.gather(
+            main.ask_llm_with_model_async("same prompt", "groq-llama3.3", deadline=main.Deadline(0.1)),
+            follower(),
+        )
+
+    leader_out, follower_out = asyncio.run(both())
+    assert leader_out.startswith("Model timeout: request deadline")
+    assert follower_out == "answer to same prompt"
+    assert len(timeouts) == 2 and min(timeouts) > 1.0
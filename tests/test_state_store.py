@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, text
+
+from app.agent.state_store import CoalescingStateStore
+
+
+def _rows(engine):
+    with engine.begin() as con:
+        return dict(con.execute(text("SELECT key, value_json FROM app_state")).fetchall())
+
+
+def test_saves_coalesce_until_flush(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    store = CoalescingStateStore(engine, flush_interval_sec=3600)
+    store.ensure_table()
+    doc = {"count": 0}
+    for i in range(5):
+        doc["count"] = i
+        store.save("json_state::usage.json", doc)
+    assert store.load("json_state::usage.json", None) == {"count": 4}
+    assert _rows(engine) == {}
+    assert store.flush() == 1
+    assert _rows(engine) == {"json_state::usage.json": '{"count": 4}'}
+    assert store.stats["writes"] == 1
+    assert store.stats["coalesced"] == 4
+    store.close()
+
+
+def test_sync_keys_write_through(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    store = CoalescingStateStore(engine, flush_interval_sec=3600, sync_keys={"json_state::auth_sessions.json"})
+    store.save("json_state::auth_sessions.json", {"sessions": {"t": 1}})
+    store.save("json_state::agents.json", {"a": 1}, sync=True)
+    assert set(_rows(engine)) == {"json_state::auth_sessions.json", "json_state::agents.json"}
+    store.save("json_state::eval.json", {"x": 1})
+    store.close()
+    assert "json_state::eval.json" in _rows(engine)
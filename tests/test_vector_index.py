@@ -0,0 +1,111 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import main
+from app.agent.vector_index import HashingEmbedder, VectorIndex
+
+
+def test_hashing_embedder_ranks_related_text_higher():
+    emb = HashingEmbedder(dim=256)
+    q, near, far = emb.embed_batch(["bitcoin market risk", "market risk for bitcoin traders", "banana bread recipe"])
+    assert float(q @ near) > float(q @ far)
+    assert abs(float(q @ q) - 1.0) < 1e-5
+
+
+def test_index_add_delete_search_and_shared_reload(tmp_path):
+    index = VectorIndex(tmp_path, HashingEmbedder(dim=128))
+    index.add("history:alice", [
+        ("s1#0", "bitcoin market momentum", {"session_id": "s1", "epoch": 200}),
+        ("s2#0", "sourdough starter feeding", {"session_id": "s2", "epoch": 100}),
+    ])
+    assert index.search("history:alice", "bitcoin market", k=1)[0][0] == "s1#0"
+    assert index.search("history:alice", "bitcoin market", where=lambda m: m["epoch"] < 150) == []
+
+    other_worker = VectorIndex(tmp_path, HashingEmbedder(dim=128))
+    assert [row_id for row_id, _, _ in other_worker.search("history:alice", "sourdough")] == ["s2#0"]
+
+    assert index.delete("history:alice", where=lambda m: m["session_id"] == "s1") == 1
+    assert index.search("history:alice", "bitcoin market") == []
+    assert not index.has("history:bob")
+
+
+def test_scoped_memory_context_ranks_by_query(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_VECTOR_INDEX", VectorIndex(tmp_path, HashingEmbedder(dim=256)))
+    monkeypatch.setattr(main, "save_memory_items", lambda: None)
+    monkeypatch.setattr(main, "memory_items_state", {"actors": {}})
+    main.upsert_memory_item("vec_tester", "Allergic to peanuts and shellfish", confidence=0.6)
+    main.upsert_memory_item("vec_tester", "Prefers Python for backend projects", confidence=0.9)
+
+    ctx = main.scoped_memory_context("vec_tester", limit=1, query="any food allergies like peanuts?")
+    assert "peanuts" in ctx
+    ranked = main.rank_memory_items("vec_tester", "python backend", main.get_memory_items_for_actor("vec_tester"))
+    assert ranked[0]["text"].startswith("Prefers Python")
+
+
+def test_updates_append_in_place_and_compact_into_new_generations(tmp_path, monkeypatch):
+    index = VectorIndex(tmp_path, HashingEmbedder(dim=64), min_capacity=4)
+    commits = []
+    original_commit = index._commit
+    monkeypatch.setattr(index, "_commit", lambda *a, **kw: commits.append(a[3]) or original_commit(*a, **kw))
+
+    index.add("history:carol", [(f"s1#{i}", f"note {i} about budgets", {"session_id": "s1"}) for i in range(2)])
+    index.add("history:carol", [("s2#0", "sourdough starter", {"session_id": "s2"})])
+    assert sorted(p.name.split(".")[1] for p in tmp_path.glob("*.npy")) == ["0"]
+    # Re-saving a session tombstones its old rows and appends the new ones in one update.
+    index.add("history:carol", [("s1#0", "budget review", {"session_id": "s1"})], replace_where=lambda m: m["session_id"] == "s1")
+    assert commits == [2, 3, 4]
+    assert index.entries("history:carol")[0] == ["s2#0", "s1#0"]
+    assert [row_id for row_id, _, _ in index.search("history:carol", "budget review")] == ["s1#0"]
+
+    other_worker = VectorIndex(tmp_path, HashingEmbedder(dim=64))
+    assert [row_id for row_id, _, _ in other_worker.search("history:carol", "sourdough")] == ["s2#0"]
+
+    # Full matrix: the next add compacts live rows into generation 1.
+    index.add("history:carol", [("s3#0", "violin scales", {"session_id": "s3"})])
+    assert sorted(p.name.split(".")[1] for p in tmp_path.glob("*.npy")) == ["0", "1"]
+    assert index.entries("history:carol")[0] == ["s2#0", "s1#0", "s3#0"]
+    assert [row_id for row_id, _, _ in other_worker.search("history:carol", "violin scales")] == ["s3#0"]
+    assert index.delete("history:carol", ids=["s2#0"]) == 1
+    assert [row_id for row_id, _, _ in other_worker.search("history:carol", "sourdough")] == []
+
+
+def test_history_vectors_keep_message_text_out_of_meta(tmp_path, monkeypatch):
+    index = VectorIndex(tmp_path, HashingEmbedder(dim=256))
+    monkeypatch.setattr(main, "_VECTOR_INDEX", index)
+    actor = "vec_history_tester"
+    main.store_history_session(actor, "vh1", "Travel", [{"ts": main.now_iso(), "label": "You", "content_text": "packing list for a ski trip"}])
+    hits = main.vector_history_search(actor, "ski trip packing", limit=2)
+    assert hits[0]["session_id"] == "vh1" and hits[0]["content_text"] == "packing list for a ski trip"
+    assert hits[0]["title"] == "Travel" and hits[0]["label"] == "You"
+    meta_text = next(tmp_path.glob("*.meta.json")).read_text(encoding="utf-8")
+    assert "ski trip" not in meta_text
+
+
+def test_workers_sharing_a_directory_never_drop_each_others_rows(tmp_path):
+    a = VectorIndex(tmp_path, HashingEmbedder(dim=64))
+    b = VectorIndex(tmp_path, HashingEmbedder(dim=64))
+    a.add("history:dave", [("seed", "seed note", {})])
+    assert b.has("history:dave")
+    meta = a._meta_path("history:dave")
+    stamp = meta.stat().st_mtime_ns
+    a.add("history:dave", [("from_a", "note from a", {})])
+    # A coarse filesystem clock: the meta looks unchanged by mtime alone.
+    os.utime(meta, ns=(stamp, stamp))
+    b.add("history:dave", [("from_b", "note from b", {})])
+    assert a.entries("history:dave")[0] == ["seed", "from_a", "from_b"]
+
+    def writer(index, prefix):
+        for i in range(15):
+            index.add("history:dave", [(f"{prefix}{i}", f"{prefix} note {i}", {})])
+
+    threads = [threading.Thread(target=writer, args=(index, prefix)) for index, prefix in ((a, "a"), (b, "b"))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    ids = VectorIndex(tmp_path, HashingEmbedder(dim=64)).entries("history:dave")[0]
+    assert sorted(ids) == sorted(["seed", "from_a", "from_b"] + [f"{p}{i}" for p in "ab" for i in range(15)])
@@ -0,0 +1,54 @@
+from app.agent import web_cache
+from app.agent.web_cache import WebCache, web_cache_key
+
+
+def test_keys_normalize_queries_but_not_urls():
+    assert web_cache_key("search", "Best  CRM\ttools ") == web_cache_key("search", "best crm tools")
+    assert web_cache_key("page", "https://a.com/X") != web_cache_key("page", "https://a.com/x")
+    assert web_cache_key("page", "q") != web_cache_key("search", "q")
+
+
+def test_ttls_are_per_kind_and_expired_entries_need_validators(tmp_path):
+    now = [0.0]
+    cache = WebCache(tmp_path / "web.db", kind_ttls={"search": 10, "page": 100}, clock=lambda: now[0])
+    cache.put("search", "q", "[]")
+    cache.put("page", "u1", "text", etag='"e"')
+    cache.put("page", "u2", "text")
+    now[0] = 50
+    assert cache.get("search", "q") is None
+    entry = cache.get("page", "u1")
+    assert entry.fresh and entry.etag == '"e"'
+    now[0] = 150
+    stale = cache.get("page", "u1")
+    assert stale is not None and not stale.fresh
+    assert cache.get("page", "u2") is None
+    assert cache.refresh("page", "u1") and cache.get("page", "u1").fresh
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    now = [0.0]
+    cache = WebCache(tmp_path / "web.db", max_bytes=2500, clock=lambda: now[0])
+    for name in ("a", "b"):
+        now[0] += 1
+        cache.put("page", name, "x" * 1000)
+    now[0] += 1
+    assert cache.get("page", "a") is not None
+    now[0] += 1
+    cache.put("page", "c", "x" * 1000)
+    assert cache.get("page", "b") is None
+    assert cache.get("page", "a") is not None and cache.get("page", "c") is not None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 2000
+
+
+def test_entries_survive_a_restart_and_the_shared_cache_is_on_disk(tmp_path, monkeypatch):
+    first = WebCache(tmp_path / "web.db")
+    first.put("page", "https://example.com/a", "page text", etag='"v1"')
+    first.close()
+    entry = WebCache(tmp_path / "web.db").get("page", "https://example.com/a")
+    assert entry.value == "page text" and entry.etag == '"v1"'
+
+    monkeypatch.delenv("LUMIERE_WEB_CACHE_DB", raising=False)
+    monkeypatch.setattr(web_cache, "DEFAULT_DB_PATH", tmp_path / "data" / "web_cache.db")
+    monkeypatch.setattr(web_cache, "_SHARED_CACHE", None)
+    shared = web_cache.shared_web_cache()
+    assert shared.db_path == str(tmp_path / "data" / "web_cache.db") and shared.stats()["disk_tier"]
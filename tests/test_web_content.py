@@ -0,0 +1,189 @@
+import io
+import threading
+import time
+
+from app.agent import web_content
+from app.agent.web_cache import WebCache
+
+PAGE = "<p>" + "useful words " * 40 + "</p>"
+
+
+def _results(n):
+    return [{"title": f"T{i}", "url": f"https://example.com/{i}", "snippet": f"snippet {i}"} for i in range(n)]
+
+
+def test_page_fetches_run_concurrently_and_stop_at_max_sources(monkeypatch):
+    started = []
+    release = threading.Event()
+
+    def fake_get(url, timeout=10, **kwargs):
+        started.append(url)
+        if url.endswith("/0"):
+            # Slow first result: its rank is kept once it arrives.
+            release.wait(2)
+            return web_content.HttpResponse(200, PAGE)
+        if url.endswith("/1"):
+            return web_content.HttpResponse(200, "<p>too short</p>")
+        if url.endswith("/2"):
+            release.set()
+            return web_content.HttpResponse(200, PAGE)
+        time.sleep(1)
+        return web_content.HttpResponse(200, PAGE)
+
+    monkeypatch.setattr(web_content, "duckduckgo_search", lambda q, max_results=5, deadline=None: _results(6))
+    monkeypatch.setattr(web_content, "shared_web_cache", lambda: None)
+    monkeypatch.setattr(web_content, "http_get", fake_get)
+
+    t0 = time.monotonic()
+    sources = web_content.gather_live_web_sources("q", max_sources=2)
+    assert time.monotonic() - t0 < 2
+    assert [s["url"] for s in sources] == ["https://example.com/0", "https://example.com/2"]
+    assert {"https://example.com/0", "https://example.com/2"} <= set(started)
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, body: bytes, content_type="text/html; charset=utf-8"):
+        super().__init__(body)
+        self.headers = _Headers(content_type)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Headers(dict):
+    def __init__(self, content_type):
+        super().__init__({"Content-Type": content_type})
+
+    def get_content_charset(self):
+        return "utf-8"
+
+
+def test_http_get_text_caps_bytes_read(monkeypatch):
+    resp = FakeResponse(b"a" * 1_000_000)
+
+    class Opener:
+        def open(self, req, timeout):
+            return resp
+
+    monkeypatch.setattr(web_content.urllib.request, "build_opener", lambda *a: Opener())
+    text = web_content.http_get_text("https://example.com", timeout=1, max_bytes=100_000)
+    assert len(text) == 100_000
+    assert resp.tell() == 100_000
+
+    monkeypatch.setattr(web_content.urllib.request, "build_opener", lambda *a: Opener())
+    resp = FakeResponse(b"%PDF", content_type="application/pdf")
+    try:
+        web_content.http_get_text("https://example.com/a.pdf", timeout=1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("binary content should be rejected")
+    assert resp.reads == 0
+
+
+def test_repeated_live_sources_skip_search_and_fetch(monkeypatch, tmp_path):
+    cache = WebCache(tmp_path / "web.db")
+    searches, fetches = [], []
+
+    def fake_scrape(query, max_results=5, deadline=None):
+        searches.append(query)
+        return _results(2)
+
+    def fake_get(url, timeout=10, etag=None, last_modified=None, **kwargs):
+        fetches.append((url, etag))
+        return web_content.HttpResponse(200, PAGE, etag=f'"{url[-1]}"')
+
+    monkeypatch.setattr(web_content, "shared_web_cache", lambda: cache)
+    monkeypatch.setattr(web_content, "_scrape_duckduckgo", fake_scrape)
+    monkeypatch.setattr(web_content, "http_get", fake_get)
+
+    first = web_content.gather_live_web_sources("Best  CRM tools", max_sources=2)
+    second = web_content.gather_live_web_sources("best crm tools", max_sources=2)
+    assert first == second and len(first) == 2
+    assert searches == ["Best  CRM tools"]
+    assert sorted(url for url, _ in fetches) == ["https://example.com/0", "https://example.com/1"]
+    stats = cache.stats()
+    assert stats["kinds"]["search"]["hits"] == 1 and stats["kinds"]["page"]["hits"] == 2
+
+
+def test_stale_pages_are_revalidated_with_conditional_get(monkeypatch, tmp_path):
+    clock = [1000.0]
+    cache = WebCache(tmp_path / "web.db", kind_ttls={"page": 60}, clock=lambda: clock[0])
+    sent = []
+
+    def fake_get(url, timeout=10, etag=None, last_modified=None, **kwargs):
+        sent.append(etag)
+        if etag == '"v1"':
+            return web_content.HttpResponse(304, "", etag, last_modified)
+        return web_content.HttpResponse(200, PAGE, etag='"v1"')
+
+    monkeypatch.setattr(web_content, "shared_web_cache", lambda: cache)
+    monkeypatch.setattr(web_content, "http_get", fake_get)
+    deadline = web_content.Deadline(10)
+
+    text = web_content.fetch_page_text("https://example.com/a", deadline)
+    clock[0] += 120
+    assert web_content.fetch_page_text("https://example.com/a", deadline) == text
+    assert web_content.fetch_page_text("https://example.com/a", deadline) == text
+    assert sent == [None, '"v1"']
+    assert cache.stats()["kinds"]["page"] == {"hits": 1, "misses": 1, "stale": 1, "revalidated": 1, "ttl_sec": 60}
+
+
+def test_cached_page_text_is_never_cut_to_another_callers_limit(monkeypatch, tmp_path):
+    cache = WebCache(tmp_path / "web.db")
+    fetches = []
+
+    def fake_get(url, timeout=10, etag=None, last_modified=None, **kwargs):
+        fetches.append(url)
+        return web_content.HttpResponse(200, PAGE)
+
+    monkeypatch.setattr(web_content, "shared_web_cache", lambda: cache)
+    monkeypatch.setattr(web_content, "http_get", fake_get)
+    deadline = web_content.Deadline(10)
+
+    short = web_content.fetch_page_text("https://example.com/a", deadline, max_chars=100)
+    full = web_content.fetch_page_text("https://example.com/a", deadline, max_chars=5000)
+    assert len(short) == 100 and len(full) > 400
+    assert web_content.fetch_page_text("https://example.com/a", deadline, max_chars=100) == short
+    assert len(fetches) == 2
+
+
+def test_page_text_skips_scripts_and_stops_once_enough_text_is_collected(monkeypatch):
+    html = (
+        "<html><head><title>Guide &amp; tips</title><style>p { color: red }</style></head>"
+        "<body><p>Hello<b>world</b></p><script>var s = '<p>hidden</p>';</script>"
+        "<noscript>enable js</noscript><div>caf&eacute;&nbsp;ok</div></body></html>"
+    )
+    assert web_content._extract_page_text(html) == "Guide & tips Hello world café ok"
+
+    fed = []
+    original_feed = web_content._PageTextParser.feed
+    monkeypatch.setattr(web_content._PageTextParser, "feed", lambda self, data: fed.append(len(data)) or original_feed(self, data))
+    big = "<p>" + "useful words " * 100 + "</p>" + "<div>tail</div>" * 50_000
+    text = web_content._extract_page_text(big, max_chars=300, chunk_chars=1024)
+    assert len(text) == 300 and text.startswith("useful words")
+    assert sum(fed) < 4096
+
+
+def test_live_sources_keep_relevant_passages_with_offsets(monkeypatch):
+    filler = "<p>" + " ".join(f"Background sentence {i} on company history." for i in range(200)) + "</p>"
+    page = filler + "<p>The seed round closed at two million dollars in March.</p>" + filler
+
+    monkeypatch.setattr(web_content, "duckduckgo_search", lambda q, max_results=5, deadline=None: _results(1))
+    monkeypatch.setattr(web_content, "shared_web_cache", lambda: None)
+    monkeypatch.setattr(web_content, "http_get", lambda url, **kwargs: web_content.HttpResponse(200, page))
+
+    [source] = web_content.gather_live_web_sources("How much did the seed round raise?", max_sources=1)
+    full_text = web_content._extract_page_text(page, max_chars=web_content.WEB_PAGE_TEXT_CHARS)
+    assert "seed round closed at two million" in source["content"]
+    assert len(source["content"]) <= web_content.WEB_PASSAGE_CHARS + 20
+    assert source["content_chars"] == len(full_text)
+    assert any("seed round" in full_text[p["start"]:p["end"]] for p in source["passages"])